@@ -1,25 +1,146 @@
 """Gemini APIラッパー。起動時チェック + クールダウン方式のモデル自動復帰付き（google-genai SDK対応版）。"""
 
+import hashlib
+import heapq
 import json
+import math
+import operator
 import os
 import re
+import sqlite3
 import time
+from collections import OrderedDict, deque
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict
 
+import httpx
 from google import genai
-import yaml
+from google.genai import types
 from dotenv import load_dotenv
 
-load_dotenv()
-
-CONFIG_PATH = Path(__file__).parent / "config.yaml"
+from config_loader import load_config
 
+load_dotenv()
 
-def load_config() -> dict:
-    with open(CONFIG_PATH, encoding="utf-8") as f:
-        return yaml.safe_load(f)
+# プロセス内で共有するモデル一覧キャッシュ APIキーのID → (取得時刻, モデル名集合)
+# 使えるモデルはキーごとに違うので、キーで分ける。別プロセスの起動でも使い回せるよう
+# MODELS_CACHE_DIR/models-<キーのID>.json にも保存する
+_MODELS_CACHE: Dict[str, tuple] = {}
+_MODELS_CACHE_TTL = 600
+MODELS_CACHE_DIR = Path.home() / ".cache" / "auto-dev-agent"
+
+# 応答を検証する手段がないロール。生の応答をレスポンスキャッシュに入れない（途中で切れた応答を再利用しない）
+_UNCACHED_ROLES = frozenset({"bootstrap"})
+
+_CODE_BLOCK_RE  = re.compile(r"```(?:json)?\s*(\{[\s\S]*?\})\s*```", re.IGNORECASE)
+# "Please retry in 25.26s" / "retryDelay: '25s'" 形式
+_RETRY_DELAY_RE = re.compile(r"retry[^0-9]*?(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+# API例外メッセージ（小文字化済み）の分類
+_RATE_RE        = re.compile(r"quota|rate|429|exhausted")
+_NOTFOUND_RE    = re.compile(r"not found|404|is not supported")
+_CACHE_GONE_RE  = re.compile(r"not found|404|expired")
+
+# ask_json がプロンプト末尾に付ける指示（リトライ時は理由だけ差し替える）
+_JSON_ONLY_SUFFIX = "\n\nJSONオブジェクト1つだけを返してください。マークダウンのコードブロック不要。説明文不要。"
+_RETRY_SUFFIX_FMT = (
+    "\n\n前回の出力が不正でした: {reason}\n"
+    "再試行の要件:\n"
+    "- JSONオブジェクト1つだけを返す\n"
+    "- マークダウンのコードブロック不要\n"
+    "- JSON前後に説明文を入れない\n"
+)
+
+# 実装AIペイロードのスキーマ（_validate_implementer_payload がこの順で検証する）
+_IMPLEMENTER_REQUIRED_KEYS  = ("files", "commit_message", "status_update", "todo_done", "todo_add")
+_IMPLEMENTER_STR_KEYS       = ("commit_message", "status_update")
+_IMPLEMENTER_STR_LIST_KEYS  = ("todo_done", "todo_add", "implemented_features", "ui_elements")
+
+# fastjsonschema があれば同じ制約をコード生成済みのバリデータで検証する
+_IMPLEMENTER_SCHEMA = {
+    "type": "object",
+    "required": list(_IMPLEMENTER_REQUIRED_KEYS),
+    "properties": {
+        "files": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["path", "content"],
+                "properties": {
+                    "path": {"type": "string", "pattern": r"\S"},
+                    "content": {"type": "string"},
+                },
+            },
+        },
+        **{key: {"type": "string"} for key in _IMPLEMENTER_STR_KEYS},
+        **{key: {"type": "array", "items": {"type": "string"}} for key in _IMPLEMENTER_STR_LIST_KEYS},
+        "assertions": {
+            "type": "array",
+            "items": {"type": "object", "properties": {"type": {"type": "string"}}},
+        },
+    },
+}
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+try:
+    import fastjsonschema
+    _VALIDATE_IMPLEMENTER = fastjsonschema.compile(_IMPLEMENTER_SCHEMA)
+except ImportError:  # 未インストール時は _validate_implementer_payload の手書き検証を使う
+    fastjsonschema = None
+    _VALIDATE_IMPLEMENTER = None
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson 未インストール時は標準 json
+    _json_loads = json.loads
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key: str, timeout_ms: int) -> genai.Client:
+    """プロセス内の Agent で genai.Client（HTTP接続プール）を共有する。"""
+    http_options = types.HttpOptions(
+        timeout=timeout_ms,
+        # keep-alive 接続を多めに保持し、リトライ時のTLSハンドシェイクを避ける
+        client_args={"limits": httpx.Limits(max_keepalive_connections=20, max_connections=50)},
+    )
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def _api_key_id(api_key: str) -> str:
+    """キャッシュのキーに使う API キーのハッシュ（キー自体は保存しない）。"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _models_cache_path(key_id: str) -> Path:
+    return MODELS_CACHE_DIR / f"models-{key_id}.json"
+
+
+def _load_models_disk_cache(key_id: str):
+    """ディスク上のモデル一覧キャッシュを読む。期限切れ・破損時は None。"""
+    try:
+        data = json.loads(_models_cache_path(key_id).read_text(encoding="utf-8"))
+        fetched_at = float(data["fetched_at"])
+        models = frozenset(data["models"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not models or time.time() - fetched_at >= _MODELS_CACHE_TTL:
+        return None
+    return fetched_at, models
+
+
+def _save_models_disk_cache(key_id: str, fetched_at: float, models: frozenset) -> None:
+    path = _models_cache_path(key_id)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"fetched_at": fetched_at, "models": sorted(models)}), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[agent] 警告: モデル一覧キャッシュの保存に失敗 ({e})")
 
 
 class Agent:
@@ -28,10 +149,11 @@ class Agent:
         if not api_key:
             raise ValueError(".env に GEMINI_API_KEY が設定されていません")
 
-        self.client = genai.Client(api_key=api_key)
-
         self.config = load_config()
-        self.switch_wait     = self.config.get("model_switch_wait", 10)
+        timeout_sec = self.config.get("agent", {}).get("request_timeout_seconds", 120)
+        self.client = _get_client(api_key, int(timeout_sec * 1000))
+        self._api_key_id = _api_key_id(api_key)
+
         self.exhausted_wait  = self.config.get("all_models_exhausted_wait", 3600)
 
         agent_cfg = self.config.get("agent", {})
@@ -40,18 +162,94 @@ class Agent:
         self.json_max_retries  = self.config.get("json_max_retries", 2)
         self.rate_cooldown_sec = agent_cfg.get("rate_cooldown_seconds", 60)
 
-        # ① 起動時に1回だけ使えるモデルをフィルタリング
-        raw_models = self.config.get("models", [])
-        self.models: list = self._filter_supported_models(raw_models)
-        if not self.models:
+        # 同一プロンプトの再送を避けるためのLRUレスポンスキャッシュ
+        cache_cfg = self.config.get("cache", {})
+        self.cache_maxsize = cache_cfg.get("response_cache_size", 512)
+        self.cache_ttl     = cache_cfg.get("response_cache_ttl_seconds", 3600)
+        self._resp_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._json_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # ask(store=False) で検証待ちの応答 (モデル名, プロンプト, テキスト, 埋め込み)
+        self._pending_response = None
+
+        # 再起動をまたいでレスポンスを使い回すための SQLite キャッシュ（任意）
+        self._db = None
+        if cache_cfg.get("persistent_cache_enabled", False):
+            db_path = Path(__file__).parent / cache_cfg.get("persistent_cache_path", ".agent_cache.sqlite")
+            self._db = self._open_persistent_cache(db_path)
+
+        # 言い換えプロンプト向けの意味的キャッシュ（埋め込みのコサイン類似度で判定）
+        self.semantic_cache_enabled   = cache_cfg.get("semantic_cache_enabled", False)
+        self.semantic_cache_threshold = cache_cfg.get("semantic_cache_threshold", 0.95)
+        self.semantic_embed_model     = cache_cfg.get("semantic_embed_model", "text-embedding-004")
+        self._emb_cache: deque = deque(maxlen=cache_cfg.get("semantic_cache_size", 1024))
+
+        # 固定プレフィックス用の Gemini コンテキストキャッシュ (hash+model → (cache名, 失効時刻))
+        self.context_cache_enabled = cache_cfg.get("context_cache_enabled", True)
+        self.context_cache_ttl     = int(cache_cfg.get("context_cache_ttl_seconds", 600))
+        self._prefix_cache: dict = {}
+
+        self._call_seq = 0
+
+        # AIMD 方式の送信間隔: 429 で倍増（上限 pacing_max）、成功ごとに pacing_step ずつ短縮
+        self.pacing_initial = float(agent_cfg.get("pacing_initial_seconds", 0.5))
+        self.pacing_max     = float(agent_cfg.get("pacing_max_seconds", 60))
+        self.pacing_step    = float(agent_cfg.get("pacing_step_seconds", 0.1))
+
+        # モデルごとのサーキットブレーカー（直近の失敗率が高いモデルを一時遮断）
+        self.breaker_failure_ratio = agent_cfg.get("circuit_breaker_failure_ratio", 0.5)
+        self.breaker_window        = agent_cfg.get("circuit_breaker_window_seconds", 30)
+        self.breaker_min_calls     = agent_cfg.get("circuit_breaker_min_calls", 3)
+        self.breaker_break_sec     = float(agent_cfg.get("circuit_breaker_break_seconds", 120))
+
+        # モデル一覧の取得（ネットワーク）は最初の呼び出しまで遅延する（_ensure_models）
+        self._raw_models: list = self.config.get("models", [])
+        self.models = None
+        self.model_name = ""
+
+    def _ensure_models(self):
+        """初回のみ使えるモデルを確定し、モデルごとの状態を初期化する。"""
+        if self.models is not None:
+            return
+
+        # ① 使えるモデルをフィルタリング
+        models = self._filter_supported_models(self._raw_models)
+        if not models:
             raise RuntimeError("使用可能なモデルがありません。APIキーとモデル設定を確認してください。")
 
-        # ② モデル名 → クールダウン解除時刻 (Unix timestamp)。0 = 使用可能
-        self._cooldown_until: dict = {m["name"]: 0.0 for m in self.models}
-
-        model_names = " > ".join(m["name"] for m in self.models)
+        # ② モデル状態は優先順位インデックスで引く並列配列で持つ
+        #   _model_names[i]:    モデル名
+        #   _cooldown_until[i]: クールダウン解除時刻 (Unix timestamp)。0 = 使用可能
+        #   _alive_gen[i]:      最新世代。古い世代のヒープエントリは取り出し時に捨てる
+        self._model_names: list = [m["name"] for m in models]
+        self._model_index: dict = {name: i for i, name in enumerate(self._model_names)}
+        self._cooldown_until: list = [0.0] * len(self._model_names)
+        self._alive_gen: list = [0] * len(self._model_names)
+
+        # ③ モデル選択用ヒープ（遅延削除方式）
+        #   _ready_heap:   使用可能なモデル (優先順位, 世代)
+        #   _cooling_heap: クールダウン中のモデル (解除時刻, 優先順位, 世代)
+        self._ready_heap: list = [(i, 0) for i in range(len(self._model_names))]
+        self._cooling_heap: list = []
+
+        # ④ クライアント側トークンバケット（config の rpm_limit。未設定のモデルは制限なし）
+        #   モデル名 → [残トークン, 最終補充時刻, 現在のRPM, 設定RPM]
+        self._buckets: dict = {
+            m["name"]: [float(m["rpm_limit"]), time.monotonic(), float(m["rpm_limit"]), float(m["rpm_limit"])]
+            for m in models if m.get("rpm_limit")
+        }
+
+        # ⑤ 送信間隔  モデル名 → [現在の間隔, 次に送信してよい時刻]
+        self._pacing: dict = {name: [self.pacing_initial, 0.0] for name in self._model_names}
+
+        # ⑥ サーキットブレーカーの呼び出し履歴
+        self._breaker_calls: dict    = {name: deque() for name in self._model_names}
+        self._breaker_failures: dict = {name: 0 for name in self._model_names}
+        self._breaker_half_open: set = set()
+
+        model_names = " > ".join(self._model_names)
         print(f"[agent] 利用可能モデル（優先順）: {model_names}")
 
+        self.models = models
         self.model_name = self._pick_best_model_name()
 
     # ------------------------------------------------------------------
@@ -59,6 +257,16 @@ class Agent:
     # ------------------------------------------------------------------
 
     def _list_available_generate_models(self) -> set:
+        key_id = self._api_key_id
+        cached = _MODELS_CACHE.get(key_id)
+        if cached is not None and time.time() - cached[0] < _MODELS_CACHE_TTL:
+            return set(cached[1])
+
+        disk = _load_models_disk_cache(key_id)
+        if disk is not None:
+            _MODELS_CACHE[key_id] = disk
+            return set(disk[1])
+
         available = set()
         try:
             for m in self.client.models.list():
@@ -69,6 +277,9 @@ class Agent:
                     available.add(name)
         except Exception as e:
             print(f"[agent] 警告: モデル一覧取得に失敗 ({e})。設定をそのまま使用します")
+        if available:
+            _MODELS_CACHE[key_id] = (time.time(), frozenset(available))
+            _save_models_disk_cache(key_id, *_MODELS_CACHE[key_id])
         return available
 
     def _filter_supported_models(self, configured: list) -> list:
@@ -78,8 +289,12 @@ class Agent:
             print("[agent] モデル一覧取得不可。設定ファイルのモデルをそのまま使用します")
             return configured
 
-        filtered = [m for m in configured if m.get("name") in available]
-        removed  = [m["name"] for m in configured if m.get("name") not in available]
+        filtered, removed = [], []
+        for m in configured:
+            if m.get("name") in available:
+                filtered.append(m)
+            else:
+                removed.append(m.get("name", ""))
         if removed:
             print(f"[agent] 非対応モデルをスキップ: {', '.join(removed)}")
         return filtered
@@ -88,25 +303,59 @@ class Agent:
     # イテレーションごとのモデル選択（クールダウン考慮）
     # ------------------------------------------------------------------
 
+    def _promote_expired(self, now: float):
+        """クールダウンが明けたモデルを使用可能ヒープへ移す。"""
+        while self._cooling_heap and self._cooling_heap[0][0] <= now:
+            _, idx, gen = heapq.heappop(self._cooling_heap)
+            if gen == self._alive_gen[idx]:
+                heapq.heappush(self._ready_heap, (idx, gen))
+
+    def _peek_ready(self) -> str:
+        """使用可能な最上位モデル名。なければ空文字。"""
+        while self._ready_heap:
+            idx, gen = self._ready_heap[0]
+            if gen == self._alive_gen[idx]:
+                return self._model_names[idx]
+            heapq.heappop(self._ready_heap)
+        return ""
+
+    def _peek_cooling(self) -> tuple:
+        """最も早く復帰するクールダウン中モデルの (解除時刻, 優先順位)。なければ (0.0, -1)。"""
+        while self._cooling_heap:
+            until, idx, gen = self._cooling_heap[0]
+            if gen == self._alive_gen[idx]:
+                return until, idx
+            heapq.heappop(self._cooling_heap)
+        return 0.0, -1
+
+    def _set_cooldown(self, model_name: str, until: float):
+        idx = self._model_index[model_name]
+        self._cooldown_until[idx] = until
+        self._alive_gen[idx] += 1
+        heapq.heappush(self._cooling_heap, (until, idx, self._alive_gen[idx]))
+
     def _pick_best_model_name(self) -> str:
         """クールダウン中でない最上位モデル名を返す。全滅なら最短クールダウン解除まで待つ。"""
         now = time.time()
+        self._promote_expired(now)
 
-        for m in self.models:
-            name = m["name"]
-            if self._cooldown_until[name] <= now:
-                print(f"[agent] モデル選択: {name}")
-                return name
+        name = self._peek_ready()
+        if name:
+            print(f"[agent] モデル選択: {name}")
+            return name
 
         # 全モデルがクールダウン中 → 一番早く解除されるまで待機
-        earliest_name = min(self.models, key=lambda m: self._cooldown_until[m["name"]])["name"]
-        wait = max(0.0, self._cooldown_until[earliest_name] - now)
+        until, idx = self._peek_cooling()
+        earliest_name = self._model_names[idx]
+        wait = max(0.0, until - now)
         print(f"[agent] 全モデルがクールダウン中。{wait:.0f}秒後に {earliest_name} が復帰します...")
         time.sleep(wait + 1)
+        self._promote_expired(time.time())
         print(f"[agent] クールダウン解除。モデル選択: {earliest_name}")
         return earliest_name
 
     def _current_model_name(self) -> str:
+        self._ensure_models()
         return self.model_name
 
     def _mark_rate_limited(self, model_name: str):
@@ -115,101 +364,462 @@ class Agent:
 
     def refresh_model(self):
         """イテレーション開始時に呼ぶ。クールダウン解除済みの上位モデルがあれば復帰。"""
-        now = time.time()
-        cur = self._current_model_name()
-
-        for m in self.models:
-            name = m["name"]
-            if self._cooldown_until[name] <= now:
-                if name != cur:
-                    print(f"[agent] 上位モデルに復帰: {cur} → {name}")
-                    self.model_name = name
-                return
+        self._ensure_models()
+        self._promote_expired(time.time())
+        cur  = self._current_model_name()
+        name = self._peek_ready()
+        if name and name != cur:
+            print(f"[agent] 上位モデルに復帰: {cur} → {name}")
+            self.model_name = name
 
     # ------------------------------------------------------------------
-    # API 呼び出し
+    # レート制限
     # ------------------------------------------------------------------
 
-    def _parse_retry_delay(self, e: Exception) -> float:
-        """APIエラーから推奨待機秒数を取り出す。なければ switch_wait を返す。"""
-        import re as _re
-        # "Please retry in 25.26s" / "retryDelay: '25s'" 形式を探す
-        m = _re.search(r"retry[^0-9]*?(\d+(?:\.\d+)?)\s*s", str(e), _re.IGNORECASE)
+    def _structured_retry_delay(self, e: Exception):
+        """例外の構造化情報（gRPC の retry_delay / google.rpc.RetryInfo）から待機秒数を取り出す。"""
+        delay = getattr(e, "retry_delay", None)
+        if delay is not None and hasattr(delay, "seconds"):
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+
+        details = getattr(e, "details", None)
+        if isinstance(details, dict):
+            # google-genai の APIError.details はレスポンスJSON（{"error": {...}} の場合あり）
+            error = details.get("error", details)
+            details = error.get("details", []) if isinstance(error, dict) else []
+        if not isinstance(details, list):
+            return None
+        for item in details:
+            if isinstance(item, dict) and str(item.get("@type", "")).endswith("RetryInfo"):
+                try:
+                    return float(str(item.get("retryDelay", "")).rstrip("s"))
+                except ValueError:
+                    return None
+        return None
+
+    def _parse_retry_delay(self, e: Exception, model_name: str) -> float:
+        """APIエラーから推奨待機秒数を取り出す。なければ rate_cooldown_sec（送信間隔の方が長ければそちら）。"""
+        delay = self._structured_retry_delay(e)
+        if delay is not None:
+            return delay
+        # 構造化情報がない場合のみメッセージ文字列から探す
+        m = _RETRY_DELAY_RE.search(str(e))
         if m:
             return float(m.group(1)) + 2  # 少し余裕を持つ
-        return float(self.switch_wait)
+        # 送信間隔（AIMD）は成功が続くと 0 近くまで縮むので、クールダウンには下限を設ける
+        return max(self._pacing[model_name][0], float(self.rate_cooldown_sec))
+
+    def _acquire_wait(self, model_name: str) -> float:
+        """トークンを1つ予約し、送信前に待つべき秒数を返す。
+
+        残トークンは負になり得る（予約済みの借り）。並行呼び出しでも順番に間隔が空く。
+        """
+        now = time.monotonic()
+
+        # AIMD の送信間隔
+        pacing = self._pacing[model_name]
+        send_at = max(now, pacing[1])
+        pacing[1] = send_at + pacing[0]
+        wait = send_at - now
+
+        bucket = self._buckets.get(model_name)
+        if bucket is None:
+            return wait
+        tokens, last, rpm, _ = bucket
+        rate = rpm / 60.0
+        tokens = min(rpm, tokens + (now - last) * rate)
+        if tokens < 1.0:
+            wait = max(wait, (1.0 - tokens) / rate)
+        bucket[0], bucket[1] = tokens - 1.0, now
+        return wait
+
+    def _acquire(self, model_name: str):
+        wait = self._acquire_wait(model_name)
+        if wait > 0:
+            print(f"[agent] 送信間隔の調整で待機: {model_name} {wait:.1f}秒")
+            time.sleep(wait)
+
+    def _slow_down(self, model_name: str):
+        """429 を受けたら RPM を 0.8 倍に絞り、送信間隔を倍にする（成功ごとに少しずつ戻す）。"""
+        bucket = self._buckets.get(model_name)
+        if bucket is not None:
+            bucket[2] = max(1.0, bucket[2] * 0.8)
+        pacing = self._pacing[model_name]
+        pacing[0] = min(self.pacing_max, max(pacing[0], self.pacing_step) * 2)
+
+    def _speed_up(self, model_name: str):
+        bucket = self._buckets.get(model_name)
+        if bucket is not None and bucket[2] < bucket[3]:
+            bucket[2] = min(bucket[3], bucket[2] + 1.0)
+        pacing = self._pacing[model_name]
+        pacing[0] = max(0.0, pacing[0] - self.pacing_step)
 
     def _mark_rate_limited_with_wait(self, model_name: str, wait_sec: float):
         """指定秒数でクールダウン登録して次の上位モデルへ切り替える。"""
         until = time.time() + wait_sec
-        self._cooldown_until[model_name] = until
+        self._set_cooldown(model_name, until)
         until_str = datetime.fromtimestamp(until).strftime("%H:%M:%S")
         print(f"[agent] {model_name} クールダウン登録（{until_str} まで / {wait_sec:.0f}秒）")
         self.model_name = self._pick_best_model_name()
 
-    def ask(self, prompt: str, role: str = "general") -> str:
-        """Geminiにプロンプトを投げてテキストを返す。レート制限は無限リトライ。"""
-        _ = role
+    # ------------------------------------------------------------------
+    # レスポンスキャッシュ
+    # ------------------------------------------------------------------
+
+    def _cache_key(self, model_name: str, prompt: str) -> str:
+        return hashlib.sha256((model_name + "\0" + prompt).encode("utf-8")).hexdigest()
+
+    def _cache_get(self, cache: OrderedDict, key: str):
+        hit = cache.get(key)
+        if hit is None:
+            return None
+        ts, value = hit
+        if time.time() - ts >= self.cache_ttl:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, cache: OrderedDict, key: str, value):
+        if self.cache_maxsize <= 0:
+            return
+        cache[key] = (time.time(), value)
+        cache.move_to_end(key)
+        while len(cache) > self.cache_maxsize:
+            cache.popitem(last=False)
+
+    def _open_persistent_cache(self, db_path: Path):
+        try:
+            db = sqlite3.connect(str(db_path))
+            db.execute("PRAGMA journal_mode=WAL")  # 複数エージェントからの同時アクセス向け
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS resp ("
+                "key TEXT PRIMARY KEY, model TEXT, ts REAL, response TEXT)"
+            )
+            db.execute("DELETE FROM resp WHERE ts < ?", (time.time() - self.cache_ttl,))
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"[agent] 永続キャッシュを開けません ({e})。メモリキャッシュのみで続行します")
+            return None
+        print(f"[agent] 永続キャッシュ: {db_path}")
+        return db
+
+    def _lookup_response(self, model_name: str, prompt: str):
+        """メモリ → SQLite の順にキャッシュ済みレスポンスを探す。"""
+        key = self._cache_key(model_name, prompt)
+        cached = self._cache_get(self._resp_cache, key)
+        if cached is not None or self._db is None:
+            return cached
+        try:
+            row = self._db.execute(
+                "SELECT ts, response FROM resp WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or time.time() - row[0] >= self.cache_ttl:
+            return None
+        self._cache_put(self._resp_cache, key, row[1])
+        return row[1]
+
+    def _store_response(self, model_name: str, prompt: str, text: str):
+        key = self._cache_key(model_name, prompt)
+        self._cache_put(self._resp_cache, key, text)
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO resp (key, model, ts, response) VALUES (?, ?, ?, ?)",
+                (key, model_name, time.time(), text),
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[agent] 永続キャッシュへの書き込みに失敗: {e}")
+
+    def clear_cache(self):
+        """レスポンスキャッシュを破棄する。"""
+        self._resp_cache.clear()
+        self._json_cache.clear()
+        self._emb_cache.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM resp")
+            self._db.commit()
+
+    def _semantic_enabled_for(self, role: str) -> bool:
+        # 実装AIの出力は正しさが最優先なので近似ヒットを使わない
+        return self.semantic_cache_enabled and role != "implementer"
+
+    def _embed(self, text: str) -> list:
+        """L2正規化済みの埋め込みベクトルを返す。失敗時は空リスト。"""
+        try:
+            result = self.client.models.embed_content(model=self.semantic_embed_model, contents=text)
+            values = list(result.embeddings[0].values)
+        except Exception as e:
+            print(f"[agent] 埋め込み取得に失敗 ({e})。意味的キャッシュをスキップします")
+            return []
+        norm = math.sqrt(sum(v * v for v in values))
+        return [v / norm for v in values] if norm else []
+
+    def _semantic_lookup(self, model_name: str, vec: list):
+        best_score, best_text = -1.0, None
+        for name, cached_vec, text in self._emb_cache:
+            if name != model_name:
+                continue
+            score = sum(map(operator.mul, vec, cached_vec))
+            if score > best_score:
+                best_score, best_text = score, text
+        if best_score >= self.semantic_cache_threshold:
+            return best_score, best_text
+        return best_score, None
+
+    # ------------------------------------------------------------------
+    # コンテキストキャッシュ（固定プレフィックス）
+    # ------------------------------------------------------------------
+
+    def _prefix_cache_name(self, model_name: str, prefix: str) -> str:
+        """プレフィックスのキャッシュ名を返す。作成できない場合は空文字（インライン送信）。"""
+        if not self.context_cache_enabled:
+            return ""
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest() + ":" + model_name
+        now = time.time()
+        entry = self._prefix_cache.get(key)
+        if entry is not None:
+            name, expires_at = entry
+            if not name:
+                return ""  # 作成失敗済み（最小トークン数未満・非対応モデルなど）
+            if expires_at - now > self.context_cache_ttl / 2:
+                return name
+            try:
+                self.client.caches.update(
+                    name=name,
+                    config=types.UpdateCachedContentConfig(ttl=f"{self.context_cache_ttl}s"),
+                )
+                self._prefix_cache[key] = (name, now + self.context_cache_ttl)
+                return name
+            except Exception:
+                del self._prefix_cache[key]  # 失効済み → 作り直す
+
+        try:
+            cache = self.client.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    contents=[prefix], ttl=f"{self.context_cache_ttl}s",
+                ),
+            )
+        except Exception as e:
+            print(f"[agent] コンテキストキャッシュ作成不可 ({model_name}): {e}。プレフィックスをインライン送信します")
+            self._prefix_cache[key] = ("", 0.0)
+            return ""
+        print(f"[agent] コンテキストキャッシュ作成: {cache.name}")
+        self._prefix_cache[key] = (cache.name, now + self.context_cache_ttl)
+        return cache.name
+
+    def _drop_prefix_cache(self, cache_name: str):
+        for key, (name, _) in list(self._prefix_cache.items()):
+            if name == cache_name:
+                del self._prefix_cache[key]
+
+    # ------------------------------------------------------------------
+    # API 呼び出し
+    # ------------------------------------------------------------------
+
+    def _next_request_id(self, prompt: str) -> str:
+        """論理呼び出しごとのリクエストID。同じ呼び出しのリトライでは使い回す。"""
+        self._call_seq += 1
+        return hashlib.sha1(f"{self._call_seq}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _request_http_options(self, request_id: str) -> types.HttpOptions:
+        # サーバー（またはプロキシ）がリトライの重複を判別できるよう同じIDを付ける
+        return types.HttpOptions(headers={"x-goog-request-id": request_id})
+
+    def ask(self, prompt: str, role: str = "general", *, cached_prefix: str = "", store: bool = True) -> str:
+        """Geminiにプロンプトを投げてテキストを返す。レート制限は無限リトライ。
+
+        cached_prefix: 呼び出し間で変わらない先頭部分。Gemini のコンテキストキャッシュに載せ、
+        prompt はその後ろに続く可変部分として送る。
+        store: False なら応答をすぐにはキャッシュせず、呼び出し側が検証してから
+        _store_pending_response() で保存する（壊れた応答を再利用しないため）。
+        """
         non_rate_attempts = 0
+        full_prompt = cached_prefix + prompt
+        request_id  = self._next_request_id(full_prompt)
+        use_cache   = role not in _UNCACHED_ROLES
+        self._pending_response = None
+
+        if use_cache:
+            cached = self._lookup_response(self._current_model_name(), full_prompt)
+            if cached is not None:
+                print("[agent] キャッシュヒット。API呼び出しをスキップします")
+                return cached
+
+        query_vec = []
+        if use_cache and self._semantic_enabled_for(role):
+            query_vec = self._embed(full_prompt)
+            if query_vec:
+                score, text = self._semantic_lookup(self._current_model_name(), query_vec)
+                if text is not None:
+                    print(f"[agent] 意味的キャッシュヒット (類似度 {score:.3f})。API呼び出しをスキップします")
+                    return text
 
         while True:
             current_name = self._current_model_name()
+            cache_name = self._prefix_cache_name(current_name, cached_prefix) if cached_prefix else ""
+            self._acquire(current_name)
             try:
                 response = self.client.models.generate_content(
                     model=current_name,
-                    contents=prompt
+                    contents=prompt if cache_name else full_prompt,
+                    config=types.GenerateContentConfig(
+                        cached_content=cache_name or None,
+                        http_options=self._request_http_options(request_id),
+                    ),
                 )
+                self._on_success(current_name)
                 if response.text:
+                    if use_cache:
+                        self._pending_response = (current_name, full_prompt, response.text, query_vec)
+                        if store:
+                            self._store_pending_response(response.text)
                     return response.text
                 raise ValueError("レスポンスのテキストが空でした")
 
             except Exception as e:
-                err_str = str(e).lower()
-
-                if "quota" in err_str or "rate" in err_str or "429" in err_str or "exhausted" in err_str:
-                    # APIが推奨する待機時間を使う（"retry in 25s" などを解析）
-                    wait = self._parse_retry_delay(e)
-                    print(f"[agent] レート制限検知: {current_name}。{wait:.0f}秒クールダウン登録")
-                    self._mark_rate_limited_with_wait(current_name, wait)
-                    non_rate_attempts = 0  # レート制限はモデル変えれば続けられるのでリセット
-
-                elif "not found" in err_str or "404" in err_str or "is not supported" in err_str:
-                    print(f"[agent] モデル利用不可: {current_name}。永続スキップします")
-                    self._cooldown_until[current_name] = time.time() + 86400 * 365
-                    self.model_name = self._pick_best_model_name()
-
-                else:
-                    non_rate_attempts += 1
-                    if non_rate_attempts < self.max_retries:
-                        wait = 5 * non_rate_attempts
-                        print(f"[agent] エラー ({e})。{wait}秒後リトライ...")
-                        time.sleep(wait)
-                    else:
-                        print(f"[agent] リトライ上限に達しました: {e}")
-                        raise
-
-    def ask_json(self, prompt: str, role: str = "general") -> dict:
+                non_rate_attempts, wait = self._handle_api_error(e, current_name, non_rate_attempts, cache_name)
+                if wait > 0:
+                    time.sleep(wait)
+
+    def _store_pending_response(self, text: str):
+        """直前の ask(store=False) の応答 text をレスポンスキャッシュ・意味的キャッシュに保存する。"""
+        pending, self._pending_response = self._pending_response, None
+        if pending is None or pending[2] != text:
+            return
+        model_name, full_prompt, text, query_vec = pending
+        self._store_response(model_name, full_prompt, text)
+        if query_vec:
+            self._emb_cache.append((model_name, query_vec, text))
+
+    def _handle_api_error(
+        self, e: Exception, current_name: str, non_rate_attempts: int, cache_name: str = "",
+    ) -> tuple:
+        """API例外を分類してモデル状態を更新する。
+
+        (non_rate_attempts, リトライ前の待機秒) を返す。リトライ上限なら例外を再送出する。
+        """
+        err_str = str(e).lower()
+
+        if cache_name and "cache" in err_str and _CACHE_GONE_RE.search(err_str):
+            print(f"[agent] コンテキストキャッシュ失効: {cache_name}。作り直します")
+            self._drop_prefix_cache(cache_name)
+            return non_rate_attempts, 0.0
+
+        if isinstance(e, (TimeoutError, httpx.TimeoutException)) or "deadline exceeded" in err_str:
+            # 応答が返らないモデルはレート制限と同様にクールダウンし、別モデルで再試行する
+            non_rate_attempts += 1
+            self._record_call(current_name, ok=False)
+            print(f"[agent] タイムアウト: {current_name}")
+            if non_rate_attempts >= self.max_retries:
+                print(f"[agent] リトライ上限に達しました: {e}")
+                raise e
+            self._mark_rate_limited(current_name)
+            return non_rate_attempts, 0.0
+
+        if _RATE_RE.search(err_str):
+            # APIが推奨する待機時間を使う（"retry in 25s" などを解析）
+            self._slow_down(current_name)
+            wait = self._parse_retry_delay(e, current_name)
+            print(f"[agent] レート制限検知: {current_name}。{wait:.0f}秒クールダウン登録")
+            self._mark_rate_limited_with_wait(current_name, wait)
+            return 0, 0.0  # レート制限はモデル変えれば続けられるのでリセット
+
+        if _NOTFOUND_RE.search(err_str):
+            print(f"[agent] モデル利用不可: {current_name}。永続スキップします")
+            self._set_cooldown(current_name, time.time() + 86400 * 365)
+            self.model_name = self._pick_best_model_name()
+            return non_rate_attempts, 0.0
+
+        non_rate_attempts += 1
+        tripped = self._record_call(current_name, ok=False)
+        if tripped:
+            # 失敗が続くモデルは一定時間遮断し、待たずに次のモデルへ切り替える
+            print(f"[agent] サーキットブレーカー作動: {current_name}。{self.breaker_break_sec:.0f}秒遮断します")
+            self._set_cooldown(current_name, time.time() + self.breaker_break_sec)
+            self.model_name = self._pick_best_model_name()
+
+        if non_rate_attempts >= self.max_retries:
+            print(f"[agent] リトライ上限に達しました: {e}")
+            raise e
+        if tripped:
+            return non_rate_attempts, 0.0
+        # 固定の線形待機ではなく、学習済みの送信間隔を基準に指数的に待つ
+        wait = min(self.pacing_max, max(1.0, self._pacing[current_name][0]) * 2 ** non_rate_attempts)
+        print(f"[agent] エラー ({e})。{wait:.0f}秒後リトライ...")
+        return non_rate_attempts, wait
+
+    def _record_call(self, model_name: str, ok: bool) -> bool:
+        """直近 breaker_window 秒の呼び出し結果を記録し、遮断すべきなら True を返す。"""
+        calls = self._breaker_calls[model_name]
+        if ok and model_name in self._breaker_half_open:
+            # 遮断明け（half-open）で成功したのでカウンタをリセット
+            self._breaker_half_open.discard(model_name)
+            calls.clear()
+            self._breaker_failures[model_name] = 0
+            return False
+
+        now = time.monotonic()
+        calls.append((now, ok))
+        if not ok:
+            self._breaker_failures[model_name] += 1
+        while calls and now - calls[0][0] > self.breaker_window:
+            _, old_ok = calls.popleft()
+            if not old_ok:
+                self._breaker_failures[model_name] -= 1
+
+        if ok or len(calls) < self.breaker_min_calls:
+            return False
+        if self._breaker_failures[model_name] / len(calls) < self.breaker_failure_ratio:
+            return False
+        calls.clear()
+        self._breaker_failures[model_name] = 0
+        self._breaker_half_open.add(model_name)
+        return True
+
+    def _on_success(self, model_name: str):
+        self._speed_up(model_name)
+        self._record_call(model_name, ok=True)
+
+    def ask_json(self, prompt: str, role: str = "general", *, cached_prefix: str = "") -> dict:
         """JSONオブジェクトを期待するask。"""
-        json_prompt = (
-            prompt
-            + "\n\nJSONオブジェクト1つだけを返してください。マークダウンのコードブロック不要。説明文不要。"
-        )
+        json_prompt = prompt + _JSON_ONLY_SUFFIX
+
+        json_key = self._cache_key(self._current_model_name(), role + "\0" + cached_prefix + json_prompt)
+        cached = self._cache_get(self._json_cache, json_key)
+        if cached is not None:
+            return cached
 
+        last_bad = ""
         for _ in range(self.json_max_retries):
-            raw = self.ask(json_prompt, role=role)
-            candidate = self._extract_json_candidate(raw)
+            # 生の応答はパース・検証に通ったものだけキャッシュする
+            raw = self.ask(json_prompt, role=role, cached_prefix=cached_prefix, store=False)
+            parsed, candidate = self._decode_first_json(raw)
             if not candidate:
                 print("[agent] JSONの抽出に失敗。リトライします...")
                 json_prompt = self._build_retry_prompt(prompt, "JSONオブジェクトの抽出に失敗")
                 continue
 
-            try:
-                parsed = json.loads(candidate)
-            except json.JSONDecodeError as e:
-                print(f"[agent] JSONパースエラー: {e}")
-                print(f"[agent] レスポンス先頭: {candidate[:200]}...")
-                json_prompt = self._build_retry_prompt(prompt, "JSON構文エラー")
-                continue
+            # 成功時はこの下で return するので、ここで記録した値は不正だった候補としてだけ使われる
+            digest = hashlib.blake2s(candidate.encode("utf-8")).hexdigest()
+            if digest == last_bad:
+                print("[agent] 前回と同一の不正な出力が返されました。リトライを打ち切ります")
+                break
+            last_bad = digest
+
+            if parsed is None:
+                try:
+                    parsed = _json_loads(candidate)
+                except json.JSONDecodeError as e:  # orjson.JSONDecodeError もこのサブクラス
+                    print(f"[agent] JSONパースエラー: {e}")
+                    print(f"[agent] レスポンス先頭: {candidate[:200]}...")
+                    json_prompt = self._build_retry_prompt(prompt, "JSON構文エラー")
+                    continue
 
             if role == "implementer":
                 ok, reason = self._validate_implementer_payload(parsed)
@@ -217,9 +827,14 @@ class Agent:
                     print(f"[agent] 実装AIの出力が不正: {reason}")
                     json_prompt = self._build_retry_prompt(prompt, f"スキーマエラー: {reason}")
                     continue
-                return self._normalize_implementer_payload(parsed)
+                normalized = self._normalize_implementer_payload(parsed)
+                self._store_pending_response(raw)
+                self._cache_put(self._json_cache, json_key, normalized)
+                return normalized
 
             if isinstance(parsed, dict):
+                self._store_pending_response(raw)
+                self._cache_put(self._json_cache, json_key, parsed)
                 return parsed
 
             json_prompt = self._build_retry_prompt(prompt, "トップレベルはJSONオブジェクトである必要があります")
@@ -231,61 +846,103 @@ class Agent:
     # ------------------------------------------------------------------
 
     def _build_retry_prompt(self, original_prompt: str, reason: str) -> str:
-        return (
-            original_prompt
-            + f"\n\n前回の出力が不正でした: {reason}\n"
-              "再試行の要件:\n"
-              "- JSONオブジェクト1つだけを返す\n"
-              "- マークダウンのコードブロック不要\n"
-              "- JSON前後に説明文を入れない\n"
-        )
+        return original_prompt + _RETRY_SUFFIX_FMT.format(reason=reason)
+
+    def _decode_first_json(self, raw: str) -> tuple:
+        """応答中の最初のJSONオブジェクトを (パース結果, 該当部分の文字列) で返す。
+
+        最初の "{" から raw_decode で直接デコードし、後ろの説明文は読まない。
+        デコードできなければ (None, 抽出候補) を返し、呼び出し側で候補をパースする。
+        """
+        text = (raw or "").strip()
+        start = text.find("{")
+        if start != -1:
+            try:
+                parsed, end = _JSON_DECODER.raw_decode(text, start)
+                return parsed, text[start:end]
+            except ValueError:
+                pass
+        return None, self._extract_json_candidate(text)
 
     def _extract_json_candidate(self, raw: str) -> str:
         text = (raw or "").strip()
         if not text:
             return ""
-        code_blocks = re.findall(r"```(?:json)?\s*(\{[\s\S]*?\})\s*```", text, flags=re.IGNORECASE)
+        code_blocks = _CODE_BLOCK_RE.findall(text)
         if code_blocks:
             return code_blocks[0].strip()
         start = text.find("{")
-        end   = text.rfind("}")
-        if start == -1 or end == -1 or end <= start:
+        if start == -1:
             return ""
-        return text[start:end + 1].strip()
+        return self._scan_balanced_json(text, start)
+
+    def _scan_balanced_json(self, text: str, start: int) -> str:
+        """start の "{" から対応する "}" までを返す（文字列リテラル・エスケープを考慮）。
+
+        後ろに説明文や別の "}" が続いても最初のオブジェクトだけを切り出す。閉じていなければ空文字。
+        """
+        depth, in_string, escape = 0, False, False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        return ""
 
     def _validate_implementer_payload(self, payload: Any) -> tuple:
-        if not isinstance(payload, dict):
+        if _VALIDATE_IMPLEMENTER is not None:
+            try:
+                _VALIDATE_IMPLEMENTER(payload)
+            except fastjsonschema.JsonSchemaException as e:
+                return False, e.message
+            return True, ""
+
+        # json.loads の結果はサブクラスを含まないので isinstance ではなく type() で判定する
+        if type(payload) is not dict:
             return False, "ペイロードはオブジェクトである必要があります"
-        required = ["files", "commit_message", "status_update", "todo_done", "todo_add"]
-        for key in required:
+        for key in _IMPLEMENTER_REQUIRED_KEYS:
             if key not in payload:
                 return False, f"必須キーがありません: {key}"
-        files = payload.get("files")
-        if not isinstance(files, list):
+        get = payload.get
+        files = get("files")
+        if type(files) is not list:
             return False, "files は配列である必要があります"
         for i, item in enumerate(files):
-            if not isinstance(item, dict):
+            if type(item) is not dict:
                 return False, f"files[{i}] はオブジェクトである必要があります"
-            if not isinstance(item.get("path"), str) or not item["path"].strip():
+            path = item.get("path")
+            if type(path) is not str or not path.strip():
                 return False, f"files[{i}].path が不正です"
-            if not isinstance(item.get("content"), str):
+            if type(item.get("content")) is not str:
                 return False, f"files[{i}].content は文字列である必要があります"
-        for key in ["commit_message", "status_update"]:
-            if not isinstance(payload.get(key), str):
+        for key in _IMPLEMENTER_STR_KEYS:
+            if type(get(key)) is not str:
                 return False, f"{key} は文字列である必要があります"
-        for key in ["todo_done", "todo_add", "implemented_features", "ui_elements"]:
-            value = payload.get(key, [])
-            if not isinstance(value, list):
+        for key in _IMPLEMENTER_STR_LIST_KEYS:
+            value = get(key, [])
+            if type(value) is not list:
                 return False, f"{key} は配列である必要があります"
-            if any(not isinstance(v, str) for v in value):
+            if not all(type(v) is str for v in value):
                 return False, f"{key} の要素は文字列である必要があります"
-        assertions = payload.get("assertions", [])
-        if not isinstance(assertions, list):
+        assertions = get("assertions", [])
+        if type(assertions) is not list:
             return False, "assertions は配列である必要があります"
         for i, a in enumerate(assertions):
-            if not isinstance(a, dict):
+            if type(a) is not dict:
                 return False, f"assertions[{i}] はオブジェクトである必要があります"
-            if not isinstance(a.get("type", ""), str):
+            if type(a.get("type", "")) is not str:
                 return False, f"assertions[{i}].type は文字列である必要があります"
         return True, ""
 
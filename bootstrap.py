@@ -1,13 +1,47 @@
 """Initialize project scaffold from brief file."""
 
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 from agent import Agent
 
 TEMPLATES_DIR = Path(__file__).parent / "templates"
 
+_SLUG_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9_-]")
+_SLUG_DASHES_RE    = re.compile(r"-+")
+
+# Brief headings (lowercased) -> result keys.
+_BRIEF_KEY_MAP = {
+    "project name": "name",
+    "name": "name",
+    "プロジェクト名": "name",
+    "genre": "genre",
+    "ジャンル": "genre",
+    "description": "description",
+    "説明": "description",
+    "todo": "todo",
+    "やってほしいこと": "todo",
+    "forbidden": "forbidden",
+    "禁止": "forbidden",
+    "github": "github",
+    "githubリポジトリ": "github",
+}
+_BRIEF_LIST_KEYS = frozenset({"todo", "forbidden"})
+_BRIEF_EMPTY_VALUES = frozenset({"なし", "none", "-"})
+
+
+@lru_cache(maxsize=16)
+def _read_template_cached(path: str, mtime: float) -> str:
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _read_template(path: Path) -> str:
+    """Read a template file, reusing the cached text until its mtime changes."""
+    return _read_template_cached(str(path), path.stat().st_mtime)
+
 
 class Bootstrap:
     def __init__(self, brief_path: Path):
@@ -33,23 +67,7 @@ class Bootstrap:
         }
 
         current_key = None
-        current_list = []
-
-        key_map = {
-            "project name": "name",
-            "name": "name",
-            "プロジェクト名": "name",
-            "genre": "genre",
-            "ジャンル": "genre",
-            "description": "description",
-            "説明": "description",
-            "todo": "todo_raw",
-            "やってほしいこと": "todo_raw",
-            "forbidden": "forbidden_raw",
-            "禁止": "forbidden_raw",
-            "github": "github",
-            "githubリポジトリ": "github",
-        }
+        current_list = None
 
         for line in self.brief_text.splitlines():
             line = line.strip()
@@ -57,51 +75,36 @@ class Bootstrap:
                 continue
 
             if ":" in line and not line.startswith("-"):
-                if current_key and current_list:
-                    result[current_key] = current_list
-                    current_list = []
-
                 key, _, value = line.partition(":")
-                mapped = key_map.get(key.strip().lower(), key_map.get(key.strip(), key.strip().lower()))
+                key_norm = key.strip().lower()
+                mapped = _BRIEF_KEY_MAP.get(key_norm, key_norm)
                 value = value.strip()
+                current_list = None
 
-                if value and value not in {"なし", "none", "-"}:
-                    result[mapped] = value
+                if value and value not in _BRIEF_EMPTY_VALUES:
+                    result[mapped] = [value] if mapped in _BRIEF_LIST_KEYS else value
                     current_key = None
                 else:
                     current_key = mapped
             elif line.startswith("-") and current_key:
+                if current_list is None:
+                    current_list = result[current_key] = []
                 current_list.append(line[1:].strip())
 
-        if current_key and current_list:
-            result[current_key] = current_list
-
-        if "todo_raw" in result:
-            if isinstance(result["todo_raw"], list):
-                result["todo"] = result["todo_raw"]
-            elif result["todo_raw"]:
-                result["todo"] = [result["todo_raw"]]
-
-        if "forbidden_raw" in result:
-            if isinstance(result["forbidden_raw"], list):
-                result["forbidden"] = result["forbidden_raw"]
-            elif result["forbidden_raw"]:
-                result["forbidden"] = [result["forbidden_raw"]]
-
-        slug = re.sub(r"[^a-zA-Z0-9_-]", "-", result["name"].lower())
-        slug = re.sub(r"-+", "-", slug).strip("-") or "my-project"
+        slug = _SLUG_NON_ALNUM_RE.sub("-", result["name"].lower())
+        slug = _SLUG_DASHES_RE.sub("-", slug).strip("-") or "my-project"
         result["slug"] = slug
         return result
 
     def _load_template(self, genre: str) -> str:
-        base = (TEMPLATES_DIR / "_base_stack.md").read_text(encoding="utf-8")
+        base = _read_template(TEMPLATES_DIR / "_base_stack.md")
 
         genre_file = TEMPLATES_DIR / f"{genre}.md"
         if genre_file.exists():
-            genre_tmpl = genre_file.read_text(encoding="utf-8")
+            genre_tmpl = _read_template(genre_file)
         else:
             print(f"[bootstrap] template {genre}.md not found; using website.md")
-            genre_tmpl = (TEMPLATES_DIR / "website.md").read_text(encoding="utf-8")
+            genre_tmpl = _read_template(TEMPLATES_DIR / "website.md")
 
         return base + "\n\n" + genre_tmpl
 
@@ -171,18 +174,31 @@ Initialized at {now}
         print(f"[bootstrap] project: {self.brief['name']}")
         print(f"[bootstrap] genre: {self.brief['genre']}")
 
-        project_dir = self._create_project_dir()
-        print(f"[bootstrap] project_dir: {project_dir}")
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            dir_fut = ex.submit(self._create_project_dir)
+            template_fut = ex.submit(self._load_template, self.brief["genre"])
+
+            print("[bootstrap] generating spec.md...")
+            spec_fut = ex.submit(self._generate_spec, template_fut.result())
 
-        template = self._load_template(self.brief["genre"])
+            # The LLM call is the long pole; render the other files while it runs.
+            project_dir = dir_fut.result()
+            print(f"[bootstrap] project_dir: {project_dir}")
+            files = [
+                ("status.md", self._generate_initial_status()),
+                ("eval_log.md", self._generate_initial_eval_log()),
+                ("brief.txt", self.brief_text),
+            ]
 
-        print("[bootstrap] generating spec.md...")
-        spec_content = self._generate_spec(template)
-        (project_dir / "spec.md").write_text(spec_content, encoding="utf-8")
+            # Nothing is written until the spec exists, so a failed LLM call
+            # never leaves a half-built scaffold behind.
+            spec_content = spec_fut.result()
 
-        (project_dir / "status.md").write_text(self._generate_initial_status(), encoding="utf-8")
-        (project_dir / "eval_log.md").write_text(self._generate_initial_eval_log(), encoding="utf-8")
-        (project_dir / "brief.txt").write_text(self.brief_text, encoding="utf-8")
+        # Write encoded bytes: LF line endings on every OS, matching how the
+        # orchestrator rewrites status.md later.
+        (project_dir / "spec.md").write_bytes(spec_content.encode("utf-8"))
+        for name, content in files:
+            (project_dir / name).write_bytes(content.encode("utf-8"))
 
         return {
             "name": self.brief["name"],
@@ -191,4 +207,4 @@ Initialized at {now}
             "github": self.brief.get("github", ""),
             "project_dir": project_dir,
             "brief": self.brief,
-        }
+        }
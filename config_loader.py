@@ -0,0 +1,64 @@
+"""config.yaml の読み込み。各モジュールで共有し、ファイルが変わるまでパース結果を使い回す。"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+CONFIG_PATH = Path(__file__).parent / "config.yaml"
+
+# 絶対パス → (mtime_ns, size, パース結果)
+_CACHE: Dict[str, Tuple[int, int, dict]] = {}
+
+
+def _sidecar_path(path: str) -> str:
+    """YAML のパース結果を保存する JSON ファイル（別プロセスの起動時に YAML を読まずに済ませる）。"""
+    return path + ".cache.json"
+
+
+def _read_sidecar(path: str, st: os.stat_result) -> Optional[dict]:
+    try:
+        with open(_sidecar_path(path), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("mtime_ns") != st.st_mtime_ns or data.get("size") != st.st_size:
+        return None
+    return data.get("config")
+
+
+def _write_sidecar(path: str, st: os.stat_result, config: dict) -> None:
+    sidecar = _sidecar_path(path)
+    tmp = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"mtime_ns": st.st_mtime_ns, "size": st.st_size, "config": config}, f, ensure_ascii=False)
+        os.replace(tmp, sidecar)
+    except (OSError, TypeError, ValueError):  # 書き込み不可・JSON にできない値があればキャッシュしない
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _parse_yaml(path: str) -> dict:
+    import yaml  # サイドカーが古いときだけ必要
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # libyaml がなければ純Python版
+    with open(path, encoding="utf-8") as f:
+        return yaml.load(f, Loader=loader) or {}
+
+
+def load_config(path: Path = CONFIG_PATH) -> dict:
+    """config.yaml を読み込む。mtime とサイズが変わらない間はキャッシュを返す（呼び出し側で変更しないこと）。"""
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    cached = _CACHE.get(key)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+
+    config = _read_sidecar(key, st)
+    if config is None:
+        config = _parse_yaml(key)
+        _write_sidecar(key, st, config)
+    _CACHE[key] = (st.st_mtime_ns, st.st_size, config)
+    return config
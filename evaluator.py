@@ -3,18 +3,15 @@
 評価AIへのAPI呼び出しは不要。静的チェック + Playwright直実行のみ。
 """
 
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from html.parser import HTMLParser
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 
-import yaml
-
-CONFIG_PATH = Path(__file__).parent / "config.yaml"
-
-
-def load_config() -> dict:
-    with open(CONFIG_PATH, encoding="utf-8") as f:
-        return yaml.safe_load(f)
+from config_loader import load_config
 
 
 class _IndexScanner(HTMLParser):
@@ -26,12 +23,47 @@ class _IndexScanner(HTMLParser):
         self.classes: Set[str] = set()
 
     def handle_starttag(self, tag, attrs):
-        attr_map = dict(attrs)
-        if eid := attr_map.get("id", ""):
-            self.ids.add(eid)
-        if cls := attr_map.get("class", ""):
-            for c in cls.split():
-                self.classes.add(c)
+        for name, val in attrs:
+            if not val:
+                continue
+            if name == "id":
+                self.ids.add(val)
+            elif name == "class":
+                self.classes.update(val.split())
+
+
+@lru_cache(maxsize=None)
+def _lxml_html():
+    """lxml.html を初回利用時に読み込む。なければ None（標準の HTMLParser で走査する）。"""
+    try:
+        import lxml.html
+    except ImportError:
+        return None
+    return lxml.html
+
+
+def _scan_index(html: str) -> Tuple[Set[str], Set[str]]:
+    """HTML中の id 集合と class 集合を返す。"""
+    lxml_html = _lxml_html()
+    if lxml_html is not None and html.strip():
+        try:
+            tree = lxml_html.fromstring(html)
+        except (ValueError, lxml_html.etree.ParserError):
+            pass
+        else:
+            ids = set(tree.xpath("//@id"))
+            ids.discard("")
+            classes = {c for cls in tree.xpath("//@class") for c in cls.split()}
+            return ids, classes
+
+    parser = _IndexScanner()
+    parser.feed(html)
+    return parser.ids, parser.classes
+
+
+# ヘッドレス実行向けの起動オプション（/dev/shm・GPU を使わない）
+# --no-sandbox は生成された HTML/JS を開くので既定では付けない（_chromium_args を参照）
+_CHROMIUM_ARGS = ["--disable-dev-shm-usage", "--disable-gpu"]
 
 
 class Evaluator:
@@ -39,19 +71,43 @@ class Evaluator:
         self.workspace = workspace
         self.config    = load_config()
         self.eval_cfg  = self.config.get("evaluation", {})
-
-        # Playwright ブラウザを起動時に1回だけ立ち上げて使い回す
+        # スモークテストで開く URI（ワークスペースの場所は変わらないので1回だけ解決する）
+        self._index_uri = (self.workspace / "index.html").resolve().as_uri()
+        # index.html の解析結果 (mtime_ns, size, ids, classes)
+        self._index_cache: Optional[tuple] = None
+        # ui_elements → (id集合, class集合, 対象外セレクタ)
+        self._ui_split_cache: Dict[tuple, tuple] = {}
+
+        # Playwright ブラウザは1回だけ立ち上げて使い回す。コンテキストはスモークテストごとに作り直す
         self._pw      = None
         self._browser = None
+        self._context = None
+        # スモークテスト1回分のエラー（ページのイベントハンドラが追記する）
+        self._page_errors: List[str]    = []
+        self._console_errors: List[str] = []
+        # 直近で通過したスモークテストのワークスペースハッシュと結果
+        self._last_smoke_hash: Optional[str] = None
+        self._last_smoke_result: Dict = {}
         self._init_browser()
 
+    def _chromium_args(self) -> List[str]:
+        # サンドボックスは root 実行時（コンテナ・Colab など、Chromium が起動を拒否する環境）だけ外す。
+        # evaluation.chromium_no_sandbox で明示的に指定もできる
+        no_sandbox = self.eval_cfg.get("chromium_no_sandbox")
+        if no_sandbox is None:
+            no_sandbox = hasattr(os, "geteuid") and os.geteuid() == 0
+        return _CHROMIUM_ARGS + ["--no-sandbox"] if no_sandbox else _CHROMIUM_ARGS
+
+    def _launch_browser(self):
+        from playwright.sync_api import sync_playwright
+        self._pw      = sync_playwright().start()
+        self._browser = self._pw.chromium.launch(headless=True, args=self._chromium_args())
+
     def _init_browser(self):
         if not self.eval_cfg.get("use_playwright", True):
             return
         try:
-            from playwright.sync_api import sync_playwright
-            self._pw      = sync_playwright().start()
-            self._browser = self._pw.chromium.launch(headless=True)
+            self._launch_browser()
             print("[evaluator] Playwright ブラウザ起動（使い回しモード）")
         except Exception as e:
             print(f"[evaluator] Playwright 利用不可: {e}")
@@ -68,16 +124,39 @@ class Evaluator:
                 [__import__("sys").executable, "-m", "playwright", "install", "chromium", "--with-deps"],
                 check=True, capture_output=True,
             )
-            from playwright.sync_api import sync_playwright
-            self._pw      = sync_playwright().start()
-            self._browser = self._pw.chromium.launch(headless=True)
+            self._launch_browser()
             print("[evaluator] Playwright ブラウザ起動完了（自動インストール後）")
         except Exception as e2:
             print(f"[evaluator] 自動インストール失敗: {e2}。静的チェックのみで続行します")
             self._pw = self._browser = None
 
+    def _new_page(self):
+        """新しいコンテキストでページを開く。localStorage・Cookie・Service Worker を前回から持ち越さない。"""
+        self._context = self._browser.new_context()
+        page = self._context.new_page()
+        page.on("pageerror", self._on_page_error)
+        page.on("console", self._on_console)
+        return page
+
+    def _close_context(self):
+        if self._context is None:
+            return
+        try:
+            self._context.close()
+        except Exception:
+            pass
+        self._context = None
+
+    def _on_page_error(self, error) -> None:
+        self._page_errors.append(str(error))
+
+    def _on_console(self, msg) -> None:
+        if msg.type == "error":
+            self._console_errors.append(msg.text)
+
     def close(self):
         """Orchestrator の終了時に呼ぶ。"""
+        self._close_context()
         try:
             if self._browser:
                 self._browser.close()
@@ -95,24 +174,33 @@ class Evaluator:
             return {"ok": False, "reason": "index.html が存在しません"}
         return {"ok": True}
 
+    def _index_sets(self) -> Tuple[Set[str], Set[str]]:
+        """index.html の (ids, classes)。同じ evaluate 内ではファイルが変わらない限り1回だけ解析する。"""
+        index = self.workspace / "index.html"
+        st = index.stat()
+        cached = self._index_cache
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2], cached[3]
+
+        ids, classes = _scan_index(index.read_text(encoding="utf-8", errors="ignore"))
+        self._index_cache = (st.st_mtime_ns, st.st_size, ids, classes)
+        return ids, classes
+
     def _check_ui_elements(self, ui_elements: List[str]) -> Dict:
         if not ui_elements:
             return {"ok": True, "missing": [], "note": ""}
 
-        html   = (self.workspace / "index.html").read_text(encoding="utf-8", errors="ignore")
-        parser = _IndexScanner()
-        parser.feed(html)
+        ids, classes = self._index_sets()
+        wanted_ids, wanted_classes, skipped = self._split_selectors(ui_elements)
 
-        missing, skipped = [], []
-        for sel in ui_elements:
-            if sel.startswith("#"):
-                if sel[1:] not in parser.ids:
-                    missing.append(sel)
-            elif sel.startswith("."):
-                if sel[1:] not in parser.classes:
-                    missing.append(sel)
-            else:
-                skipped.append(sel)
+        missing = []
+        if not (wanted_ids <= ids and wanted_classes <= classes):
+            # 失敗時だけ、報告用に元の順序で不足セレクタを並べる
+            missing_ids, missing_classes = wanted_ids - ids, wanted_classes - classes
+            missing = [
+                sel for sel in ui_elements
+                if (sel[:1] == "#" and sel[1:] in missing_ids) or (sel[:1] == "." and sel[1:] in missing_classes)
+            ]
 
         return {
             "ok":      len(missing) == 0,
@@ -120,11 +208,32 @@ class Evaluator:
             "note":    f"スキップ: {', '.join(skipped)}" if skipped else "",
         }
 
+    def _split_selectors(self, ui_elements: List[str]) -> Tuple[frozenset, frozenset, List[str]]:
+        """セレクタを (id集合, class集合, 対象外) に分ける。同じリストはイテレーションをまたいで使い回す。"""
+        key = tuple(ui_elements)
+        cached = self._ui_split_cache.get(key)
+        if cached is not None:
+            return cached
+
+        ids, classes, skipped = [], [], []
+        for sel in ui_elements:
+            if sel.startswith("#"):
+                ids.append(sel[1:])
+            elif sel.startswith("."):
+                classes.append(sel[1:])
+            else:
+                skipped.append(sel)
+        if len(self._ui_split_cache) >= 64:
+            self._ui_split_cache.clear()
+        cached = self._ui_split_cache[key] = (frozenset(ids), frozenset(classes), skipped)
+        return cached
+
     def _run_assertions(self, assertions: List[dict]) -> Dict:
         if not assertions:
             return {"ok": True, "note": ""}
 
         failures = []
+        contents: Dict[str, Optional[bytes]] = {}  # text_in_file のパス → 内容（なければ None）
         for i, a in enumerate(assertions):
             if not isinstance(a, dict):
                 failures.append(f"assertions[{i}] がオブジェクトではありません")
@@ -138,15 +247,25 @@ class Evaluator:
 
             elif atype == "text_in_file":
                 path, text = str(a.get("path", "")).strip(), str(a.get("text", ""))
-                target = self.workspace / path
-                if not path or not target.exists():
+                if path not in contents:
+                    target = self.workspace / path
+                    # 同じファイルへの assertion は1回だけ読み、デコードせずバイト列で検索する
+                    contents[path] = target.read_bytes() if path and target.exists() else None
+                data = contents[path]
+                if data is None:
                     failures.append(f"text_in_file: ファイルなし: {path}")
-                elif text not in target.read_text(encoding="utf-8", errors="ignore"):
+                elif text.encode("utf-8") not in data:
                     failures.append(f"text_in_file: テキストなし in {path}")
 
             elif atype == "selector_exists":
                 sel = str(a.get("selector", "")).strip()
-                if not self._check_ui_elements([sel])["ok"]:
+                if sel.startswith("#"):
+                    found = sel[1:] in self._index_sets()[0]
+                elif sel.startswith("."):
+                    found = sel[1:] in self._index_sets()[1]
+                else:
+                    found = True  # id/class 以外のセレクタは静的チェック対象外
+                if not found:
                     failures.append(f"selector_exists 失敗: {sel}")
 
             else:
@@ -156,30 +275,52 @@ class Evaluator:
             return {"ok": False, "reason": "; ".join(failures)}
         return {"ok": True, "note": f"assertions 全通過: {len(assertions)}件"}
 
+    def _static_checks(self, ui_elements: List[str], assertions: List[dict]) -> Tuple[Dict, Dict]:
+        """② UI要素 と ③ assertions の結果を返す。② が失敗したら ③ は実行しない。"""
+        ui = self._check_ui_elements(ui_elements)
+        if not ui["ok"]:
+            return ui, {"ok": True, "note": ""}
+        return ui, self._run_assertions(assertions)
+
     # ------------------------------------------------------------------
     # Playwright スモークテスト（ブラウザ使い回し・最小待機）
     # ------------------------------------------------------------------
 
+    def _workspace_digest(self) -> str:
+        """ワークスペース内の全ファイル（相対パス + 内容）のハッシュ。"""
+        h = hashlib.blake2b(digest_size=16)
+        root = str(self.workspace)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                h.update(os.path.relpath(full, root).encode("utf-8") + b"\0")
+                with open(full, "rb") as f:
+                    h.update(f.read())
+                h.update(b"\0")
+        return h.hexdigest()
+
     def _playwright_smoke(self) -> Dict:
         if not self.eval_cfg.get("use_playwright", True):
             return {"ok": True, "note": "Playwright無効"}
         if self._browser is None:
             return {"ok": True, "note": "Playwright未起動。静的チェックのみ"}
 
+        # 前回通過時からワークスペースが変わっていなければブラウザを動かさない
+        digest = self._workspace_digest()
+        if digest == self._last_smoke_hash:
+            return self._last_smoke_result
+
         timeout_ms = int(self.eval_cfg.get("test_timeout_seconds", 10)) * 1000
-        index_uri  = (self.workspace / "index.html").resolve().as_uri()
-        page       = None
+        index_uri  = self._index_uri
+        page_errors, console_errors = self._page_errors, self._console_errors
+        page_errors.clear()
+        console_errors.clear()
 
         try:
-            page = self._browser.new_page()
-
-            page_errors, console_errors = [], []
-            page.on("pageerror", lambda e: page_errors.append(str(e)))
-            page.on("console",   lambda m: console_errors.append(m.text) if m.type == "error" else None)
-
-            page.goto(index_uri, wait_until="domcontentloaded", timeout=timeout_ms)
-            # 最小限の待機（50ms）
-            page.wait_for_timeout(50)
+            page = self._new_page()
+            # load イベント（スクリプト・画像の読み込み完了）まで待つ。固定の待機は入れない
+            page.goto(index_uri, wait_until="load", timeout=timeout_ms)
 
             # ボタンを1つだけクリック
             clicked = 0
@@ -190,7 +331,8 @@ class Evaluator:
                 except Exception:
                     pass
 
-            body_len = len(page.locator("body").inner_text())
+            # テキスト本体は転送せず、長さだけをページ内で計算して受け取る
+            body_len = page.evaluate("() => document.body ? document.body.innerText.length : 0")
 
             if page_errors:
                 return {"ok": False, "reason": f"ランタイムエラー: {page_errors[0]}"}
@@ -199,17 +341,16 @@ class Evaluator:
             if body_len == 0:
                 return {"ok": False, "reason": "body が空（真っ白）"}
 
-            return {"ok": True, "note": f"スモークテスト通過 (body:{body_len}chars clicks:{clicked})"}
+            result = {"ok": True, "note": f"スモークテスト通過 (body:{body_len}chars clicks:{clicked})"}
+            self._last_smoke_hash, self._last_smoke_result = digest, result
+            return result
 
         except Exception as e:
             return {"ok": False, "reason": f"Playwright エラー: {e}"}
 
         finally:
-            if page:
-                try:
-                    page.close()
-                except Exception:
-                    pass
+            # ストレージごと破棄する（ブラウザ本体は次回も使う）
+            self._close_context()
 
     # ------------------------------------------------------------------
     # 総合評価エントリポイント
@@ -222,23 +363,31 @@ class Evaluator:
         assertions: Optional[List[dict]] = None,
     ) -> dict:
 
+        # 直前に executor が書き換えているので前回の解析結果は使わない
+        self._index_cache = None
+
         # ① index.html の存在確認
         r = self._check_required_files()
         if not r["ok"]:
             return {"passed": False, "reason": r["reason"], "note": ""}
 
-        # ② UI要素の静的チェック
-        ui = self._check_ui_elements(ui_elements)
+        # ②③ 静的チェックはワーカースレッドで、④ スモークテストはこのスレッドで並行して走らせる
+        #   （Playwright の同期APIは起動したスレッドからしか呼べないため、こちらを残す）
+        assertions = assertions or []
+        if self._browser is not None:
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                static = pool.submit(self._static_checks, ui_elements, assertions)
+                smoke  = self._playwright_smoke()
+                ui, ar = static.result()
+        else:
+            ui, ar = self._static_checks(ui_elements, assertions)
+            smoke  = self._playwright_smoke()
+
+        # 失敗理由は ② → ③ → ④ の順で報告する
         if not ui["ok"]:
             return {"passed": False, "reason": f"UI要素なし: {', '.join(ui['missing'])}", "note": ui["note"]}
-
-        # ③ assertions
-        ar = self._run_assertions(assertions or [])
         if not ar["ok"]:
             return {"passed": False, "reason": ar["reason"], "note": ""}
-
-        # ④ Playwright スモークテスト
-        smoke = self._playwright_smoke()
         if not smoke["ok"]:
             return {"passed": False, "reason": smoke["reason"], "note": ""}
 
@@ -3,6 +3,8 @@ executor.py
 AIの指示を実際のファイル操作に変換する
 """
 
+import os
+import shutil
 from pathlib import Path
 
 
@@ -10,12 +12,25 @@ class Executor:
     def __init__(self, workspace: Path):
         self.workspace = workspace
         self.workspace.mkdir(parents=True, exist_ok=True)
+        # 書き込み先チェック用に実パスを1回だけ解決しておく
+        self._root = self.workspace.resolve()
+        self._root_str = str(self._root)
+
+    def _inside_root(self, target: Path) -> bool:
+        """target が workspace 配下のファイルパスか。前方一致ではなく共通パスで判定する（workspace2/ などを誤って許可しない）"""
+        if target == self._root:
+            return False
+        try:
+            return os.path.commonpath([self._root_str, str(target)]) == self._root_str
+        except ValueError:  # Windows で別ドライブ
+            return False
 
     def write_files(self, files: list):
         """
         files: [{"path": "index.html", "content": "..."}, ...]
         workspaceディレクトリ内にのみ書き込む（セキュリティ）
         """
+        made_dirs = set()
         for file_info in files:
             path_str = file_info.get("path", "")
             content = file_info.get("content", "")
@@ -24,14 +39,27 @@ class Executor:
                 continue
 
             # パストラバーサル対策
-            target = (self.workspace / path_str).resolve()
-            if not str(target).startswith(str(self.workspace.resolve())):
+            target = (self._root / path_str).resolve()
+            if not self._inside_root(target):
                 print(f"[executor] 危険なパス検出、スキップ: {path_str}")
                 continue
 
-            # ディレクトリ作成
-            target.parent.mkdir(parents=True, exist_ok=True)
+            # ディレクトリ作成（同じ親ディレクトリは1回だけ）
+            parent = target.parent
+            if parent not in made_dirs:
+                parent.mkdir(parents=True, exist_ok=True)
+                made_dirs.add(parent)
 
-            # 書き込み
-            target.write_text(content, encoding="utf-8")
+            # 書き込み（UTF-8 のバイト列をそのまま書く）
+            # スナップショットとハードリンクを共有しているので、上書きせず別ファイルに書いて置き換える
+            tmp = target.with_name(target.name + ".tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(content.encode("utf-8"))
+                if target.exists():
+                    shutil.copymode(target, tmp)  # 実行権限などのモードを引き継ぐ
+                os.replace(tmp, target)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
             print(f"[executor] 書き込み: {path_str} ({len(content)} chars)")
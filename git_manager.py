@@ -4,18 +4,35 @@ import os
 import subprocess
 import sys
 from pathlib import Path
+from typing import Optional
 
-import requests
-import yaml
 from dotenv import load_dotenv
 
+from config_loader import load_config
+
 load_dotenv()
-CONFIG_PATH = Path(__file__).parent / "config.yaml"
+
+# GitHub API 用の keep-alive セッション（接続・TLSを使い回す）。API 経由の作成時だけ作る
+_SESSION = None
+
+
+def _github_session():
+    global _SESSION
+    if _SESSION is None:
+        import requests  # 使われることが少ないので起動時には読み込まない
+        _SESSION = requests.Session()
+        _SESSION.headers.update({"Accept": "application/vnd.github.v3+json"})
+    return _SESSION
 
 
-def load_config() -> dict:
-    with open(CONFIG_PATH, encoding="utf-8") as f:
-        return yaml.safe_load(f)
+# 非対話の git/gh 呼び出し用: 標準入力を渡さず、Windows ではコンソールを割り当てない
+_QUIET_SPAWN = {
+    "stdin": subprocess.DEVNULL,
+    "creationflags": subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0,
+}
+
+# コミット対象（プロジェクト直下の名前）
+STAGE_CANDIDATES = ("workspace", "assets", "status.md", "eval_log.md", "spec.md", "brief.txt")
 
 
 class GitManager:
@@ -29,6 +46,11 @@ class GitManager:
         github_cfg = self.config.get("github", {})
         self.auto_login_with_gh = github_cfg.get("auto_login_with_gh", True)
         self.gh_login_web = github_cfg.get("gh_login_web", True)
+        # gh の検出結果（None = 未確認）。インスタンスの寿命の間は使い回す
+        self._gh_installed_cache: Optional[bool] = None
+        self._gh_auth_cache: Optional[bool] = None
+        # 直近のコミット時点のコミット対象ファイル一覧（None = 次回は git add から行う）
+        self._committed_files: Optional[frozenset] = None
 
     def _run(self, cmd: list, check=False) -> subprocess.CompletedProcess:
         return subprocess.run(
@@ -39,26 +61,31 @@ class GitManager:
             encoding="utf-8",
             errors="replace",
             check=check,
+            **_QUIET_SPAWN,
         )
 
     def _gh_installed(self) -> bool:
-        try:
-            result = subprocess.run(
-                ["gh", "--version"],
-                capture_output=True, text=True, encoding="utf-8", errors="replace",
-            )
-            return result.returncode == 0
-        except FileNotFoundError:
-            return False
+        if self._gh_installed_cache is None:
+            try:
+                result = subprocess.run(
+                    ["gh", "--version"],
+                    capture_output=True, text=True, encoding="utf-8", errors="replace", **_QUIET_SPAWN,
+                )
+                self._gh_installed_cache = result.returncode == 0
+            except FileNotFoundError:
+                self._gh_installed_cache = False
+        return self._gh_installed_cache
 
     def _gh_available(self) -> bool:
         if not self._gh_installed():
             return False
-        result = subprocess.run(
-            ["gh", "auth", "status"],
-            capture_output=True, text=True, encoding="utf-8", errors="replace",
-        )
-        return result.returncode == 0
+        if self._gh_auth_cache is None:
+            result = subprocess.run(
+                ["gh", "auth", "status"],
+                capture_output=True, text=True, encoding="utf-8", errors="replace", **_QUIET_SPAWN,
+            )
+            self._gh_auth_cache = result.returncode == 0
+        return self._gh_auth_cache
 
     def _is_interactive(self) -> bool:
         try:
@@ -85,6 +112,7 @@ class GitManager:
         if result.returncode != 0:
             print("[git] gh auth login が失敗またはキャンセルされました")
             return False
+        self._gh_auth_cache = None  # ログインしたので認証状態を取り直す
         return self._gh_available()
 
     def _create_repo_via_gh(self, repo_name: str, visibility: str) -> str:
@@ -92,7 +120,7 @@ class GitManager:
         result = subprocess.run(
             ["gh", "repo", "create", repo_name, f"--{visibility}", "--source=.", "--remote=origin", "--push"],
             cwd=self.project_dir,
-            capture_output=True, text=True, encoding="utf-8", errors="replace",
+            capture_output=True, text=True, encoding="utf-8", errors="replace", **_QUIET_SPAWN,
         )
         if result.returncode != 0:
             print(f"[git] gh repo create 失敗: {result.stderr}")
@@ -101,7 +129,7 @@ class GitManager:
         url_result = subprocess.run(
             ["gh", "repo", "view", "--json", "url", "-q", ".url"],
             cwd=self.project_dir,
-            capture_output=True, text=True, encoding="utf-8", errors="replace",
+            capture_output=True, text=True, encoding="utf-8", errors="replace", **_QUIET_SPAWN,
         )
         url = url_result.stdout.strip()
         print(f"[git] ✅ リポジトリ作成完了: {url}")
@@ -113,11 +141,8 @@ class GitManager:
 
         print(f"[git] GitHub API でリポジトリを作成中: {repo_name}")
         payload = {"name": repo_name, "private": visibility == "private", "auto_init": False}
-        headers = {
-            "Authorization": f"token {self.github_token}",
-            "Accept": "application/vnd.github.v3+json",
-        }
-        resp = requests.post("https://api.github.com/user/repos", json=payload, headers=headers, timeout=10)
+        headers = {"Authorization": f"token {self.github_token}"}
+        resp = _github_session().post("https://api.github.com/user/repos", json=payload, headers=headers, timeout=10)
         if resp.status_code != 201:
             print(f"[git] API 作成失敗: {resp.status_code} {resp.text[:200]}")
             return ""
@@ -172,29 +197,66 @@ class GitManager:
         else:
             print("[git] リモートなし。ローカルコミットのみ")
 
-    def _stage_paths(self):
-        stage_candidates = [
-            "workspace", "assets", "status.md", "eval_log.md", "spec.md", "brief.txt",
-        ]
-        existing = [p for p in stage_candidates if (self.project_dir / p).exists()]
+    def _existing_candidates(self) -> list:
+        # git は一致しない pathspec があると add 全体を失敗させるので、存在するものだけ渡す。
+        # 個別に stat せず、プロジェクト直下を1回だけ列挙して判定する
+        try:
+            entries = set(os.listdir(self.project_dir))
+        except OSError:
+            entries = set()
+        return [p for p in STAGE_CANDIDATES if p in entries]
+
+    def _candidate_files(self, existing: list) -> frozenset:
+        """コミット対象配下の全ファイル（プロジェクトからの相対パス）。"""
+        files = []
+        root = str(self.project_dir)
+        for name in existing:
+            top = os.path.join(root, name)
+            if not os.path.isdir(top):
+                files.append(name)
+                continue
+            for dirpath, _, filenames in os.walk(top):
+                rel = os.path.relpath(dirpath, root)
+                files.extend(os.path.join(rel, f) for f in filenames)
+        return frozenset(files)
+
+    def _stage_paths(self, existing: list):
         if not existing:
-            self._run(["git", "add", "."])
+            self._run(["git", "add", "-A"])
             return
-        self._run(["git", "add", "--"] + existing)
+        self._run(["git", "add", "-A", "--"] + existing)
 
     def commit(self, message: str, iteration: int) -> bool:
-        self._stage_paths()
-        result = self._run(["git", "commit", "-m", f"[iter-{iteration:04d}] {message}"])
+        existing = self._existing_candidates()
+        files = self._candidate_files(existing)
+        full_message = f"[iter-{iteration:04d}] {message}"
+
+        result = None
+        # 前回のコミット以降に新しいファイルがなければ、追跡済みファイルの変更・削除だけなので
+        # git add を省き、パス指定の commit（--only）1回でコミット候補の配下だけをコミットする
+        if self._committed_files is not None and files <= self._committed_files:
+            tracked_tops = {f.split(os.sep, 1)[0] for f in self._committed_files}
+            tracked = [name for name in existing if name in tracked_tops]
+            if tracked:
+                result = self._run(["git", "commit", "-m", full_message, "--"] + tracked)
+                if result.returncode != 0 and "pathspec" in result.stderr:
+                    result = None  # 追跡されていない候補があった。通常の手順でやり直す
+        if result is None:
+            self._stage_paths(existing)
+            result = self._run(["git", "commit", "-m", full_message])
 
         if result.returncode == 0:
-            print(f"[git] コミット完了: [iter-{iteration:04d}] {message}")
+            self._committed_files = files
+            print(f"[git] コミット完了: {full_message}")
             return True
 
         combined = (result.stdout + result.stderr).lower()
-        if "nothing to commit" in combined:
+        if "nothing to commit" in combined or "no changes added to commit" in combined:
+            self._committed_files = files
             print("[git] コミットする変更がありません")
             return False
 
+        self._committed_files = None  # 次回は全体をステージし直す
         print(f"[git] コミット失敗: {result.stderr[:200]}")
         return False
 
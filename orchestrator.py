@@ -1,25 +1,169 @@
 """イテレーションループコントローラー。"""
 
+import bisect
+import copy
+import hashlib
+import importlib.metadata
+import os
+import re
 import shutil
 import subprocess
 import sys
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-
-import yaml
+from typing import Optional
 
 from agent import Agent
+from config_loader import load_config
 from evaluator import Evaluator
 from executor import Executor
 from git_manager import GitManager
 
-CONFIG_PATH = Path(__file__).parent / "config.yaml"
+# Playwright の起動確認済みマーカーの置き場所（マシン単位）
+PLAYWRIGHT_MARKER_DIR = Path.home() / ".cache" / "auto-dev-agent"
 
 CURRENT_ITER_HEADERS = ["## Current Iteration", "## 現在のイテレーション"]
 TODO_HEADERS         = ["## TODO", "## やること"]
 NEXT_PLAN_HEADERS    = ["## Next Iteration Plan", "## 次のイテレーション計画"]
 
+# status.md の TODO 行（"- [ ] 項目" / "- [x] 項目"）から項目を取り出す
+_TODO_ITEM_RE = re.compile(r"- \[[ x]\] (.*)")
+
+# 同じ状況（spec・workspace・フィードバック）への実装AIの応答を覚えておく件数
+CONTEXT_CACHE_SIZE = 32
+
+# 実装AIプロンプトの固定部分（毎回組み立て直さない）。この後に spec.md が続く
+_IMPLEMENTER_PREFIX_HEAD = """
+あなたは自律的なWeb実装エージェントです。
+後続のコンテキストを読み、JSONオブジェクト1つだけを出力してください。
+
+ルール:
+- spec.md と status.md のルールを必ず守ること
+- 小さく、具体的で、テスト可能な変更にすること
+- コードは常に動く状態を維持すること
+- 既存ファイルを変更する場合、動作中の機能を壊さないこと
+
+JSONスキーマ:
+{
+  "thought": "なぜこれをやるかの簡潔な理由",
+  "action_type": "init|add_feature|improve_ui|fix_bug|refactor",
+  "files": [{"path":"index.html","content":"..."}],
+  "implemented_features": ["..."],
+  "ui_elements": ["#id", ".class"],
+  "assertions": [
+    {"type":"file_exists","path":"index.html"},
+    {"type":"text_in_file","path":"index.html","text":"Start"},
+    {"type":"selector_exists","selector":"#app"}
+  ],
+  "commit_message": "feat: ...",
+  "status_update": "次のイテレーション計画",
+  "todo_done": ["..."],
+  "todo_add": ["..."]
+}
+
+# spec.md
+"""
+
+_IMPLEMENTER_PROMPT_TAIL = """
+上記のコンテキストを踏まえ、JSONスキーマに従ったJSONオブジェクト1つだけを出力してください。
+"""
+
+
+def _scan_files(root: Path, dirs: Optional[list] = None) -> list:
+    """root 配下の全ファイルを (相対パス, フルパス) のソート済みリストで返す。
+
+    os.scandir で1回だけ走査し、DirEntry の種別情報を使うのでファイルごとの stat は不要。
+    dirs を渡すと、走査したディレクトリ（root を含む）のパスを追記する。
+    """
+    found = []
+    stack = [(str(root), "")]
+    while stack:
+        dirpath, prefix = stack.pop()
+        if dirs is not None:
+            dirs.append(dirpath)
+        try:
+            it = os.scandir(dirpath)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                rel = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel + os.sep))
+                elif entry.is_file():
+                    found.append((rel, entry.path))
+    found.sort()
+    return found
+
+
+def _dir_signature(dirs: list) -> tuple:
+    """各ディレクトリの mtime（存在しなければ None）。中身の追加・削除で変わる。"""
+    signature = []
+    for d in dirs:
+        try:
+            signature.append(os.stat(d).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _read_utf8(path: Path) -> str:
+    """テキストモード（TextIOWrapper）を通さずに読む。改行は read_text と同じく \n に揃える。"""
+    return path.read_bytes().decode("utf-8").replace("\r\n", "\n")
+
+
+def _tail_text(path: Path, nchars: int) -> str:
+    """ファイル末尾の nchars 文字を返す（0 以下なら全体）。UTF-8 で足りる分（文字数×4バイト）だけ読む。"""
+    if nchars <= 0:
+        return _read_utf8(path)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(max(0, size - nchars * 4))
+        data = f.read()
+    # 途中から読んだ先頭の欠けた文字は捨てる。改行は read_text と同じく \n に揃える
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n")[-nchars:]
+
+
+def _fmt_elapsed(seconds: float) -> str:
+    """経過秒数を H:MM:SS にする。"""
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}"
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """ハードリンクで複製する。別ファイルシステムなどでリンクできなければコピーする。"""
+    try:
+        os.link(src, dst)
+        return
+    except FileExistsError:
+        os.unlink(dst)
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+
+
+# スナップショット削除用。1本のスレッドで順番に処理し、rmtree 同士が競合しないようにする
+_PRUNE_POOL = ThreadPoolExecutor(max_workers=1)
+
+
+def _prune_snapshots(snapshots_root: Path, keep: int) -> None:
+    try:
+        with os.scandir(snapshots_root) as it:
+            names = sorted(entry.name for entry in it)
+    except OSError:
+        return
+    for name in names[:-keep]:
+        shutil.rmtree(os.path.join(snapshots_root, name), ignore_errors=True)
+
 
 class Orchestrator:
     def __init__(
@@ -34,8 +178,14 @@ class Orchestrator:
         self.workspace   = self.project_dir / "workspace"
         self.iteration   = 0
 
-        with open(CONFIG_PATH, encoding="utf-8") as f:
-            self.config = yaml.safe_load(f)
+        # 毎イテレーション使うパスは1回だけ組み立てる
+        self._status_path    = self.project_dir / "status.md"
+        self._eval_log_path  = self.project_dir / "eval_log.md"
+        self._spec_path      = self.project_dir / "spec.md"
+        self._snapshots_root = self.project_dir / "snapshots"
+        self._assets_dir     = self.project_dir / "assets"
+
+        self.config = load_config()
 
         iter_cfg = self.config.get("iteration", {})
 
@@ -52,8 +202,8 @@ class Orchestrator:
         cfg_interval   = iter_cfg.get("interval_seconds", 0)  # 0=即時連続
         self.interval  = interval if interval >= 0 else cfg_interval
 
-        # 開始時刻（時間制限の計算用）
-        self.started_at = datetime.now()
+        # 開始時刻（時間制限・経過時間の計算用。時計の変更に影響されない monotonic）
+        self._t0 = time.monotonic()
 
         log_cfg = self.config.get("logging", {})
         self.eval_log_max_chars            = log_cfg.get("eval_log_max_chars", 2000)
@@ -62,6 +212,13 @@ class Orchestrator:
         self.prompt_workspace_file_limit   = log_cfg.get("prompt_workspace_file_limit", 20)
         self.prompt_workspace_chars_per_file = log_cfg.get("prompt_workspace_chars_per_file", 3000)
 
+        # assets/ の一覧キャッシュ (走査したディレクトリ, その mtime, 一覧テキスト)
+        self._assets_cache: Optional[tuple] = None
+        # spec.md のキャッシュ (mtime_ns, size, 内容)
+        self._spec_cache: Optional[tuple] = None
+        # _context_key → 実装AIの応答（LRU、CONTEXT_CACHE_SIZE 件まで）
+        self._ctx_cache: "OrderedDict[str, dict]" = OrderedDict()
+
         self.consecutive_passes  = 0
         self.no_change_streak    = 0
         self.last_fail_iteration = 0
@@ -103,11 +260,35 @@ class Orchestrator:
                 f"stderr: {result.stderr[-400:]}"
             )
 
+    def _playwright_marker(self) -> Optional[Path]:
+        """起動確認済みを記録するファイル。Playwright のバージョンごとに分ける（未インストールなら None）。"""
+        try:
+            version = importlib.metadata.version("playwright")
+        except importlib.metadata.PackageNotFoundError:
+            return None
+        return PLAYWRIGHT_MARKER_DIR / f"playwright-ok-{version}"
+
+    def _mark_playwright_ready(self):
+        marker = self._playwright_marker()
+        if marker is None:
+            return
+        try:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        except OSError:
+            pass
+
     def _ensure_playwright_runtime(self):
         eval_cfg = self.config.get("evaluation", {})
         if not eval_cfg.get("use_playwright", True):
             return
+        marker = self._playwright_marker()
+        if marker is not None and marker.exists():
+            # このバージョンでは起動確認済み。ブラウザを立ち上げての確認は省く
+            print("[orchestrator] Playwright 実行環境: 準備済み")
+            return
         if self._playwright_runtime_ready():
+            self._mark_playwright_ready()
             print("[orchestrator] Playwright 実行環境: 準備済み")
             return
 
@@ -122,6 +303,7 @@ class Orchestrator:
             return
 
         if self._playwright_runtime_ready():
+            self._mark_playwright_ready()
             print("[orchestrator] Playwright セットアップ完了")
         else:
             print("[orchestrator] Playwright セットアップ失敗。静的チェックのみで続行します")
@@ -131,38 +313,51 @@ class Orchestrator:
     # ------------------------------------------------------------------
 
     def _list_assets(self) -> str:
-        assets_dir = self.project_dir / "assets"
-        files = [f for f in assets_dir.rglob("*") if f.is_file()]
-        return "（なし）" if not files else "\n".join(
-            f"- assets/{f.relative_to(assets_dir)}" for f in files
+        # assets/ はほぼ変わらない。前回走査したディレクトリの mtime がどれも同じなら
+        # （ファイル・サブディレクトリの追加削除がなければ）前回の一覧をそのまま使う
+        if self._assets_cache is not None:
+            dirs, signature, text = self._assets_cache
+            if _dir_signature(dirs) == signature:
+                return text
+
+        dirs: list = []
+        files = _scan_files(self._assets_dir, dirs)
+        text = "（なし）" if not files else "\n".join(
+            f"- assets/{rel}" for rel, _ in files
         )
+        self._assets_cache = (dirs, _dir_signature(dirs), text)
+        return text
 
-    def _list_workspace(self) -> str:
-        files = [f for f in self.workspace.rglob("*") if f.is_file()]
+    def _list_workspace(self, files: list) -> str:
         return "（ファイルなし）" if not files else "\n".join(
-            f"- {f.relative_to(self.workspace)}" for f in files
+            f"- {rel}" for rel, _ in files
         )
 
-    def _workspace_content_for_prompt(self) -> str:
-        files = [f for f in self.workspace.rglob("*") if f.is_file()]
+    def _workspace_content_for_prompt(self, files: list) -> str:
         if not files:
             return "（ファイルなし）"
-        parts = []
-        for f in sorted(files)[: self.prompt_workspace_file_limit]:
-            rel     = f.relative_to(self.workspace)
-            content = f.read_text(encoding="utf-8", errors="ignore")[: self.prompt_workspace_chars_per_file]
-            parts.append(f"### {rel}\n```\n{content}\n```")
+        targets = files[: self.prompt_workspace_file_limit]
+        if not targets:
+            return ""
+        # 読み込みは I/O 待ちなのでスレッドで並行させる（map は入力順で返す）
+        with ThreadPoolExecutor(max_workers=min(8, len(targets))) as pool:
+            contents = pool.map(self._read_excerpt, (path for _, path in targets))
+            parts = [f"### {rel}\n```\n{content}\n```" for (rel, _), content in zip(targets, contents)]
         return "\n\n".join(parts)
 
-    def _read_context(self) -> str:
-        spec     = (self.project_dir / "spec.md").read_text(encoding="utf-8")
-        status   = (self.project_dir / "status.md").read_text(encoding="utf-8")
-        eval_log = (self.project_dir / "eval_log.md").read_text(encoding="utf-8")[-self.eval_log_max_chars:]
+    def _read_excerpt(self, path: str) -> str:
+        # 捨てる末尾は読まない。UTF-8 は1文字最大4バイトなので文字数×4バイトで足りる
+        limit = self.prompt_workspace_chars_per_file
+        with open(path, "rb") as f:
+            data = f.read(limit * 4)
+        return data.decode("utf-8", errors="ignore")[:limit]
 
-        return f"""
-# spec.md
-{spec}
+    def _read_context(self, ws_files: list) -> str:
+        """ws_files は workspace（または同じ中身のスナップショット）の走査結果。一覧と内容抜粋で共有する。"""
+        status   = _read_utf8(self._status_path)
+        eval_log = _tail_text(self._eval_log_path, self.eval_log_max_chars)
 
+        return f"""
 # status.md
 {status}
 
@@ -173,12 +368,25 @@ class Orchestrator:
 {self._list_assets()}
 
 # workspaceのファイル一覧
-{self._list_workspace()}
+{self._list_workspace(ws_files)}
 
 # workspaceのファイル内容（抜粋）
-{self._workspace_content_for_prompt()}
+{self._workspace_content_for_prompt(ws_files)}
 """
 
+    def _read_spec(self) -> str:
+        # spec.md はほぼ変わらないので mtime とサイズが同じ間は前回の内容を使う
+        st = self._spec_path.stat()
+        if self._spec_cache is not None and self._spec_cache[:2] == (st.st_mtime_ns, st.st_size):
+            return self._spec_cache[2]
+        spec = _read_utf8(self._spec_path)
+        self._spec_cache = (st.st_mtime_ns, st.st_size, spec)
+        return spec
+
+    def _implementer_prefix(self) -> str:
+        """イテレーション間で変わらない部分（指示・スキーマ・spec.md）。コンテキストキャッシュに載せる。"""
+        return _IMPLEMENTER_PREFIX_HEAD + self._read_spec() + "\n"
+
     def _implementer_prompt(self, context: str, feedback: str = "") -> str:
         feedback_section = ""
         if feedback:
@@ -187,156 +395,201 @@ class Orchestrator:
 {feedback}
 このフィードバックを元に失敗原因を修正してください。
 """
-        return f"""
-あなたは自律的なWeb実装エージェントです。
-以下のコンテキストを読み、JSONオブジェクト1つだけを出力してください。
-
-{context}
-{feedback_section}
-
-ルール:
-- spec.md と status.md のルールを必ず守ること
-- 小さく、具体的で、テスト可能な変更にすること
-- コードは常に動く状態を維持すること
-- 既存ファイルを変更する場合、動作中の機能を壊さないこと
-
-JSONスキーマ:
-{{
-  "thought": "なぜこれをやるかの簡潔な理由",
-  "action_type": "init|add_feature|improve_ui|fix_bug|refactor",
-  "files": [{{"path":"index.html","content":"..."}}],
-  "implemented_features": ["..."],
-  "ui_elements": ["#id", ".class"],
-  "assertions": [
-    {{"type":"file_exists","path":"index.html"}},
-    {{"type":"text_in_file","path":"index.html","text":"Start"}},
-    {{"type":"selector_exists","selector":"#app"}}
-  ],
-  "commit_message": "feat: ...",
-  "status_update": "次のイテレーション計画",
-  "todo_done": ["..."],
-  "todo_add": ["..."]
-}}
-"""
+        return "".join(("\n", context, "\n", feedback_section, _IMPLEMENTER_PROMPT_TAIL))
 
     # ------------------------------------------------------------------
     # スナップショット / ロールバック
     # ------------------------------------------------------------------
 
     def _take_snapshot(self, stage: str) -> Path:
-        snapshot_dir = self.project_dir / "snapshots" / f"iter-{self.iteration:04d}-{stage}"
+        snapshot_dir = self._snapshots_root / f"iter-{self.iteration:04d}-{stage}"
         if self.workspace.exists():
-            shutil.copytree(self.workspace, snapshot_dir, dirs_exist_ok=True)
+            # 中身はコピーせずハードリンクで共有する（executor は置き換えで書くので共有先は変わらない）
+            shutil.copytree(self.workspace, snapshot_dir, dirs_exist_ok=True, copy_function=_link_or_copy)
         keep = self.config["iteration"].get("snapshot_keep", 20)
-        snapshots_root = self.project_dir / "snapshots"
-        if snapshots_root.exists():
-            for old in sorted(snapshots_root.iterdir())[:-keep]:
-                shutil.rmtree(old, ignore_errors=True)
+        # 古いスナップショットの削除は何も待たせないのでバックグラウンドで行う
+        _PRUNE_POOL.submit(_prune_snapshots, self._snapshots_root, keep)
         return snapshot_dir
 
     def _rollback(self, snapshot_dir: Path):
         if snapshot_dir.exists():
-            shutil.rmtree(self.workspace, ignore_errors=True)
-            shutil.copytree(snapshot_dir, self.workspace)
+            # 失敗した workspace は rename で退避するだけにして、削除はバックグラウンドで行う。
+            # スナップショットはリトライ時の再ロールバックや履歴に使うので rename で消費せずリンクで戻す
+            # 退避先は snapshots/ 内（git 対象外で、取り残されても古い順の整理で消える）
+            discard = self._snapshots_root / f".rollback-{self.iteration:04d}-{time.time_ns()}"
+            try:
+                os.rename(self.workspace, discard)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                shutil.rmtree(self.workspace, ignore_errors=True)
+            else:
+                _PRUNE_POOL.submit(shutil.rmtree, discard, ignore_errors=True)
+            shutil.copytree(snapshot_dir, self.workspace, copy_function=_link_or_copy)
             print(f"[orchestrator] ロールバック完了: {snapshot_dir.name}")
 
     # ------------------------------------------------------------------
     # status.md 更新
     # ------------------------------------------------------------------
 
-    def _find_heading_range(self, lines: list, headings: list):
-        start = -1
+    def _heading_index(self, lines: list) -> tuple:
+        """1回の走査で (見出し → 最初に現れる行番号, "## " で始まる行番号のリスト) を作る。"""
+        first_line: dict = {}
+        boundaries: list = []
         for i, line in enumerate(lines):
-            if line.strip() in headings:
-                start = i
-                break
-        if start == -1:
+            if "## " not in line:
+                continue
+            stripped = line.strip()
+            if stripped.startswith("## ") and stripped not in first_line:
+                first_line[stripped] = i
+            if line.startswith("## "):
+                boundaries.append(i)
+        return first_line, boundaries
+
+    def _find_heading_range(self, index: tuple, line_count: int, headings: list):
+        first_line, boundaries = index
+        found = [first_line[h] for h in headings if h in first_line]
+        if not found:
             return None
-        end = len(lines)
-        for i in range(start + 1, len(lines)):
-            if lines[i].startswith("## "):
-                end = i
-                break
+        start = min(found)
+        k     = bisect.bisect_right(boundaries, start)
+        end   = boundaries[k] if k < len(boundaries) else line_count
         return start, end
 
-    def _replace_section_body(self, status_text: str, headings: list, new_body: str) -> str:
-        lines   = status_text.splitlines()
-        section = self._find_heading_range(lines, headings)
-        if not section:
-            return status_text
-        start, end  = section
-        body_lines  = [l.rstrip() for l in new_body.strip().splitlines()] if new_body.strip() else [""]
-        new_lines   = lines[: start + 1] + body_lines + lines[end:]
-        return "\n".join(new_lines) + ("\n" if status_text.endswith("\n") else "")
-
-    def _set_current_iteration(self, status_text: str) -> str:
-        lines   = status_text.splitlines()
-        section = self._find_heading_range(lines, CURRENT_ITER_HEADERS)
-        if not section:
-            return status_text
-        start, end = section
-        iter_line  = f"iter-{self.iteration:04d}"
-        if start + 1 < end:
-            lines[start + 1] = iter_line
-            if end - (start + 1) > 1:
-                del lines[start + 2: end]
-        else:
-            lines.insert(start + 1, iter_line)
-        return "\n".join(lines) + ("\n" if status_text.endswith("\n") else "")
-
-    def _insert_todo_if_missing(self, status_text: str, todo_item: str) -> str:
-        if f"- [ ] {todo_item}" in status_text or f"- [x] {todo_item}" in status_text:
-            return status_text
-        lines = status_text.splitlines()
-        todo_section = self._find_heading_range(lines, TODO_HEADERS)
-        if todo_section:
-            _, end = todo_section
-            lines.insert(end, f"- [ ] {todo_item}")
-            return "\n".join(lines) + ("\n" if status_text.endswith("\n") else "")
-        next_section = self._find_heading_range(lines, NEXT_PLAN_HEADERS)
-        if next_section:
-            start, _ = next_section
-            lines.insert(start, f"- [ ] {todo_item}")
-            return "\n".join(lines) + ("\n" if status_text.endswith("\n") else "")
-        return status_text + f"\n- [ ] {todo_item}\n"
+    def _new_todo_lines(self, status: str, todo_add: list) -> list:
+        """まだ status.md にない TODO 行（同じ呼び出しで追加する分との重複も除く）。"""
+        # 既存の TODO（未完了・完了とも）を1回の走査で集合にしておく
+        existing = {item.rstrip() for item in _TODO_ITEM_RE.findall(status)}
+        added: list = []
+        for todo_item in todo_add:
+            key = todo_item.rstrip()
+            if key in existing:
+                continue
+            existing.add(key)
+            added.append(f"- [ ] {todo_item}")
+        return added
 
     def _update_status(self, impl_result: dict):
-        status_path = self.project_dir / "status.md"
-        status = status_path.read_text(encoding="utf-8")
-        for done in impl_result.get("todo_done", []):
-            status = status.replace(f"- [ ] {done}", f"- [x] {done}")
-        for add in impl_result.get("todo_add", []):
-            status = self._insert_todo_if_missing(status, add)
-        status = self._set_current_iteration(status)
+        status = _read_utf8(self._status_path)
+
+        # 完了した TODO のチェックは1回の置換でまとめて行う
+        done = [d for d in impl_result.get("todo_done", []) if d]
+        if done:
+            done_re = re.compile(r"- \[ \] (" + "|".join(map(re.escape, done)) + ")")
+            status = done_re.sub(lambda m: "- [x] " + m.group(1), status)
+
+        # 見出しの位置は1回だけ調べ、編集は (開始, 終了, 置き換える行) にまとめて後ろから適用する
+        trailing_newline = status.endswith("\n")
+        lines = status.splitlines()
+        index = self._heading_index(lines)
+        count = len(lines)
+        edits = []
+
+        todo_lines = self._new_todo_lines(status, impl_result.get("todo_add", []))
+        if todo_lines:
+            todo_section = self._find_heading_range(index, count, TODO_HEADERS)
+            next_section = self._find_heading_range(index, count, NEXT_PLAN_HEADERS)
+            if todo_section:
+                edits.append((todo_section[1], todo_section[1], todo_lines))
+            elif next_section:
+                edits.append((next_section[0], next_section[0], todo_lines))
+            else:
+                # 見出しがなければ末尾に足す（空の status.md でも先頭に空行が入る）
+                appended = []
+                for todo_line in todo_lines:
+                    if trailing_newline or not (lines or appended):
+                        appended.append("")
+                    appended.append(todo_line)
+                    trailing_newline = True
+                edits.append((count, count, appended))
+
+        current_section = self._find_heading_range(index, count, CURRENT_ITER_HEADERS)
+        if current_section:
+            start, end = current_section
+            edits.append((start + 1, end, [f"iter-{self.iteration:04d}"]))
+
         next_plan = impl_result.get("status_update", "").strip()
         if next_plan:
-            status = self._replace_section_body(status, NEXT_PLAN_HEADERS, next_plan)
-        status_path.write_text(status, encoding="utf-8")
+            next_section = self._find_heading_range(index, count, NEXT_PLAN_HEADERS)
+            if next_section:
+                start, end = next_section
+                edits.append((start + 1, end, [l.rstrip() for l in next_plan.splitlines()]))
+
+        # 後ろの編集から適用すれば前の行番号はずれない（同じ位置なら先に追加した編集が後ろに来る）
+        for start, end, new_lines in sorted(edits, key=lambda e: e[0], reverse=True):
+            lines[start:end] = new_lines
+        self._status_path.write_bytes(("\n".join(lines) + ("\n" if trailing_newline else "")).encode("utf-8"))
+
+    def _elapsed_str(self) -> str:
+        return _fmt_elapsed(time.monotonic() - self._t0)
 
     def _append_eval_log(self, action_type: str, commit_msg: str, result: str, note: str = ""):
-        log_path = self.project_dir / "eval_log.md"
-        elapsed  = datetime.now() - self.started_at
         entry = f"""
-## iter-{self.iteration:04d} | {datetime.now().strftime('%Y-%m-%d %H:%M')} | 経過{str(elapsed).split('.')[0]}
+## iter-{self.iteration:04d} | {datetime.now().strftime('%Y-%m-%d %H:%M')} | 経過{self._elapsed_str()}
 - アクション: {action_type}
 - コミット: {commit_msg}
 - 結果: {result}
 - 備考: {note}
 """
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(entry)
+        with open(self._eval_log_path, "ab") as f:
+            f.write(entry.encode("utf-8"))
 
     # ------------------------------------------------------------------
     # 1イテレーション
     # ------------------------------------------------------------------
 
-    def _run_single_attempt(self, feedback: str = "") -> tuple:
-        context     = self._read_context()
-        impl_result = self.agent.ask_json(
-            self._implementer_prompt(context, feedback), role="implementer"
-        )
+    def _context_key(self, ws_files: list, feedback: str) -> str:
+        """spec.md・workspace の中身・フィードバックのハッシュ。
+
+        status.md と eval_log.md は毎イテレーション追記されるので含めない（含めると同じ状況でも一致しない）。
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self._read_spec().encode("utf-8"))
+        h.update(b"\0")
+        for rel, path in ws_files:
+            h.update(rel.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                h.update(f.read())
+            h.update(b"\0")
+        h.update(b"\0")
+        h.update(feedback.encode("utf-8"))
+        return h.hexdigest()
+
+    def _ask_implementer(self, prompt: str, prefix: str, key: str) -> tuple:
+        """(実装AIの応答, 以前の応答を再利用したか) を返す。
+
+        spec・workspace・フィードバックが以前と同じならほぼ同じ出力が返るだけなので、LLM を呼ばずに前回の応答を使う。
+        """
+        cached = self._ctx_cache.get(key)
+        if cached is not None:
+            self._ctx_cache.move_to_end(key)
+            print("[orchestrator] ⚠ 以前と同じ状況です。前回の応答を再利用します")
+            return copy.deepcopy(cached), True  # 呼び出し側の変更がキャッシュに及ばないように
+
+        impl_result = self.agent.ask_json(prompt, role="implementer", cached_prefix=prefix)
+        if impl_result:
+            self._ctx_cache[key] = copy.deepcopy(impl_result)
+            while len(self._ctx_cache) > CONTEXT_CACHE_SIZE:
+                self._ctx_cache.popitem(last=False)
+        return impl_result, False
+
+    def _run_single_attempt(self, feedback: str = "", ws_root: Optional[Path] = None, pending=None) -> tuple:
+        """(実装AIの応答, 評価結果, 以前の応答を再利用したか) を返す。
+
+        ws_root を渡すと workspace の代わりにそのディレクトリ（同じ中身のスナップショット）を読む。
+        pending（Future）があれば、LLM 呼び出しの後・ファイル書き込みの前に完了を待つ。
+        """
+        ws_files    = _scan_files(ws_root or self.workspace)
+        context     = self._read_context(ws_files)
+        prompt      = self._implementer_prompt(context, feedback)
+        prefix      = self._implementer_prefix()
+        key         = self._context_key(ws_files, feedback)
+        impl_result, reused = self._ask_implementer(prompt, prefix, key)
+        if pending is not None:
+            pending.result()
         if not impl_result or "files" not in impl_result:
-            return {}, {"passed": False, "reason": "実装AIの出力が不正", "note": ""}
+            self._ctx_cache.pop(key, None)
+            return {}, {"passed": False, "reason": "実装AIの出力が不正", "note": ""}, reused
 
         print(f"[orchestrator] アクション: {impl_result.get('action_type')}")
         if self.show_thought:
@@ -351,7 +604,10 @@ JSONスキーマ:
             impl_result.get("ui_elements", []),
             impl_result.get("assertions", []),
         )
-        return impl_result, eval_result
+        if not eval_result.get("passed"):
+            # 評価に落ちた応答は再利用しない（同じ状況になったら LLM に作り直させる）
+            self._ctx_cache.pop(key, None)
+        return impl_result, eval_result, reused
 
     def _build_evolution_boost_feedback(self) -> str:
         return (
@@ -380,10 +636,8 @@ JSONスキーマ:
 
     def _run_iteration(self):
         self.iteration += 1
-        elapsed = datetime.now() - self.started_at
-
         print(f"\n{'=' * 50}")
-        print(f"  イテレーション {self.iteration:04d}  |  経過時間 {str(elapsed).split('.')[0]}")
+        print(f"  イテレーション {self.iteration:04d}  |  経過時間 {self._elapsed_str()}")
         print(f"{'=' * 50}")
 
         # クールダウン解除済みの上位モデルへ復帰チェック
@@ -398,15 +652,24 @@ JSONスキーマ:
             self.last_boost_iteration = self.iteration
             print(f"[orchestrator] evolution boost applied: {boost_reason}")
 
-        impl_result, eval_result = self._run_single_attempt(feedback=boost_feedback)
+        impl_result, eval_result, reused = self._run_single_attempt(feedback=boost_feedback)
 
         if not eval_result.get("passed"):
             reason = eval_result.get("reason", "不明なエラー")
             print(f"[orchestrator] 1回目の試行 失敗: {reason}")
-            self._rollback(pre_snapshot)
-            impl_result, eval_result = self._run_single_attempt(
-                feedback=f"評価失敗の理由: {reason}"
-            )
+            retry_feedback = f"評価失敗の理由: {reason}"
+            if pre_snapshot.exists():
+                # ロールバック後の workspace はスナップショットと同じ中身なので、
+                # コンテキストはスナップショットから読み、ロールバックは LLM 呼び出しと並行させる
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    rollback = pool.submit(self._rollback, pre_snapshot)
+                    impl_result, eval_result, retry_reused = self._run_single_attempt(
+                        feedback=retry_feedback, ws_root=pre_snapshot, pending=rollback
+                    )
+            else:
+                self._rollback(pre_snapshot)
+                impl_result, eval_result, retry_reused = self._run_single_attempt(feedback=retry_feedback)
+            reused = reused or retry_reused
 
         if eval_result.get("passed"):
             print("[orchestrator] ✅ PASS")
@@ -426,6 +689,9 @@ JSONスキーマ:
             print(f"[orchestrator] ❌ FAIL (リトライ後も失敗): {reason}")
             self._rollback(pre_snapshot)
             self.consecutive_passes = 0
+            if reused:
+                # 以前と同じ状況の繰り返しは停滞として数える（1イテレーションにつき1回。PASS 側は未コミットで数える）
+                self.no_change_streak += 1
             self.last_fail_iteration = self.iteration
             self._take_snapshot("post-fail")
             self._append_eval_log(
@@ -444,7 +710,7 @@ JSONスキーマ:
             return True, f"最大イテレーション数 {self.max_iterations} 回に達しました"
 
         if self.max_minutes > 0:
-            elapsed_min = (datetime.now() - self.started_at).total_seconds() / 60
+            elapsed_min = (time.monotonic() - self._t0) / 60
             if elapsed_min >= self.max_minutes:
                 return True, f"実行時間 {self.max_minutes} 分に達しました（実際: {elapsed_min:.1f}分）"
 
@@ -492,9 +758,8 @@ JSONスキーマ:
             print("\n[orchestrator] 中断されました")
 
         finally:
-            elapsed = datetime.now() - self.started_at
             print(f"[orchestrator] 総イテレーション数: {self.iteration}回")
-            print(f"[orchestrator] 総経過時間: {str(elapsed).split('.')[0]}")
+            print(f"[orchestrator] 総経過時間: {self._elapsed_str()}")
             self.evaluator.close()
             self.git.push()
             print("[orchestrator] 最新状態をGitHubにpushしました")
@@ -0,0 +1,59 @@
+"""Agent のレスポンスキャッシュ: 検証に通らなかった応答は再利用しない。"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import agent as agent_mod  # noqa: E402
+
+
+class _FakeModels:
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def generate_content(self, model, contents, config):
+        self.calls += 1
+        return SimpleNamespace(text=self.texts.pop(0))
+
+
+def _make_agent(monkeypatch, texts):
+    models = _FakeModels(texts)
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setattr(agent_mod, "_get_client", lambda api_key, timeout_ms: SimpleNamespace(models=models))
+    monkeypatch.setattr(agent_mod.Agent, "_filter_supported_models", lambda self, configured: configured)
+    monkeypatch.setattr(agent_mod.Agent, "_acquire", lambda self, model_name: None)
+    agent = agent_mod.Agent()
+    agent._raw_models = [{"name": "test-model"}]
+    agent.json_max_retries = 1
+    agent.cache_maxsize = 16
+    agent._db = None
+    agent.semantic_cache_enabled = False
+    return agent, models
+
+
+def test_bad_json_response_is_not_served_from_cache(monkeypatch):
+    agent, models = _make_agent(monkeypatch, ['{"a": ', '{"a": 1}'])
+
+    assert agent.ask_json("prompt") == {}
+    assert agent.ask_json("prompt") == {"a": 1}
+    assert models.calls == 2
+
+
+def test_valid_json_response_is_cached(monkeypatch):
+    agent, models = _make_agent(monkeypatch, ['{"a": 1}'])
+
+    assert agent.ask_json("prompt") == {"a": 1}
+    agent._json_cache.clear()
+    assert agent.ask_json("prompt") == {"a": 1}  # 生の応答キャッシュから
+    assert models.calls == 1
+
+
+def test_bootstrap_role_is_not_cached(monkeypatch):
+    agent, models = _make_agent(monkeypatch, ["# spec (途中で切れ", "# spec"])
+
+    assert agent.ask("brief", role="bootstrap") == "# spec (途中で切れ"
+    assert agent.ask("brief", role="bootstrap") == "# spec"
+    assert models.calls == 2
@@ -0,0 +1,66 @@
+"""実装AIの応答の再利用: 評価に落ちた応答は次のイテレーションで再利用しない。"""
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import orchestrator as orchestrator_mod  # noqa: E402
+
+
+class _FakeAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def refresh_model(self):
+        pass
+
+    def ask_json(self, prompt, role="general", *, cached_prefix=""):
+        self.calls += 1
+        return {
+            "action_type": "fix_bug",
+            "files": [{"path": "index.html", "content": "<p>broken</p>"}],
+            "commit_message": "fix",
+        }
+
+
+class _FailingEvaluator:
+    def __init__(self, workspace):
+        pass
+
+    def evaluate(self, *args):
+        return {"passed": False, "reason": "always fails", "note": ""}
+
+
+class _FakeGit:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def init(self):
+        pass
+
+
+@pytest.fixture
+def orch(tmp_path, monkeypatch):
+    (tmp_path / "workspace").mkdir()
+    (tmp_path / "workspace" / "index.html").write_text("<p>ok</p>", encoding="utf-8")
+    (tmp_path / "spec.md").write_text("# spec\n", encoding="utf-8")
+    (tmp_path / "status.md").write_text("## Current Iteration\niter-0000\n", encoding="utf-8")
+    (tmp_path / "eval_log.md").write_text("# eval_log.md\n", encoding="utf-8")
+
+    monkeypatch.setattr(orchestrator_mod, "load_config", lambda: {"iteration": {"snapshot_keep": 20}})
+    monkeypatch.setattr(orchestrator_mod, "Agent", _FakeAgent)
+    monkeypatch.setattr(orchestrator_mod, "Evaluator", _FailingEvaluator)
+    monkeypatch.setattr(orchestrator_mod, "GitManager", _FakeGit)
+    monkeypatch.setattr(orchestrator_mod.Orchestrator, "_ensure_playwright_runtime", lambda self: None)
+    o = orchestrator_mod.Orchestrator({"project_dir": tmp_path})
+    yield o
+    orchestrator_mod._PRUNE_POOL.submit(lambda: None).result()  # バックグラウンド削除の完了を待つ
+
+
+def test_failed_responses_are_not_replayed_in_later_iterations(orch):
+    orch._run_iteration()
+    assert orch.agent.calls == 2  # 1回目 + リトライ
+
+    orch._run_iteration()
+    assert orch.agent.calls == 4
+    assert orch.no_change_streak == 0
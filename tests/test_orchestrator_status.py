@@ -0,0 +1,35 @@
+"""status.md の更新: 現在のイテレーション欄を書き換えても、追加した TODO は消えない。"""
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import orchestrator as orchestrator_mod  # noqa: E402
+
+
+def _update(tmp_path, status: str, impl_result: dict) -> str:
+    status_path = tmp_path / "status.md"
+    status_path.write_text(status, encoding="utf-8")
+    orch = orchestrator_mod.Orchestrator.__new__(orchestrator_mod.Orchestrator)
+    orch._status_path = status_path
+    orch.iteration = 7
+    orch._update_status(impl_result)
+    return status_path.read_text(encoding="utf-8")
+
+
+def test_todo_appended_at_eof_survives_when_current_iteration_is_last(tmp_path):
+    status = "# Status\n\n## Current Iteration\niter-0006\n"
+    result = _update(tmp_path, status, {"todo_add": ["new task"]})
+    assert result == "# Status\n\n## Current Iteration\niter-0007\n\n- [ ] new task\n"
+
+
+def test_todo_before_next_plan_survives_after_empty_current_iteration(tmp_path):
+    status = "## Current Iteration\n## Next Iteration Plan\nplan\n"
+    result = _update(tmp_path, status, {"todo_add": ["new task"]})
+    assert result == "## Current Iteration\niter-0007\n- [ ] new task\n## Next Iteration Plan\nplan\n"
+
+
+def test_existing_todo_is_not_duplicated(tmp_path):
+    status = "## TODO\n- [x] done task\n\n## Current Iteration\niter-0006\n"
+    result = _update(tmp_path, status, {"todo_add": ["done task", "new task", "new task"]})
+    assert result == "## TODO\n- [x] done task\n\n- [ ] new task\n## Current Iteration\niter-0007\n"